@@ -23,7 +23,7 @@ Protecciones de seguridad:
 --------------------------
 * Timeouts cortos (10 segundos máximo)
 * Límite de reintentos (máximo 2)
-* Rate limiting interno
+* Rate limiting token-bucket compartido entre workers (respeta Retry-After)
 * Límite de transacciones por sincronización
 * Validación de datos antes de procesar
 
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
 from . import tesote_connector
 from . import tesote_config
-from . import tesote_account
\ No newline at end of file
+from . import tesote_account
+from . import account_bank_statement
\ No newline at end of file
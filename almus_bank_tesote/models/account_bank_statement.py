@@ -6,4 +6,19 @@ class AccountBankStatement(models.Model):
     
     tesote_account_id = fields.Many2one('tesote.account', string='Tesote Account',
                                         readonly=True, ondelete='set null',
-                                        help='Source Tesote account for this statement')
\ No newline at end of file
+                                        help='Source Tesote account for this statement')
+
+
+class AccountBankStatementLine(models.Model):
+    _inherit = 'account.bank.statement.line'
+    
+    tesote_transaction_id = fields.Char(string='Tesote Transaction', readonly=True, copy=False,
+                                        help='Transaction id in Tesote, used to skip already imported lines')
+    tesote_journal_id = fields.Many2one('account.journal', string='Tesote Journal',
+                                        readonly=True, copy=False, ondelete='cascade',
+                                        help='Journal the Tesote transaction was imported into')
+    
+    _sql_constraints = [
+        ('tesote_transaction_uniq', 'unique (tesote_journal_id, tesote_transaction_id)',
+         'This Tesote transaction has already been imported into the journal'),
+    ]
\ No newline at end of file
@@ -1,3 +1,30 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import json
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Hilos máximos para descargar varias cuentas a la vez (solo HTTP)
+MAX_SYNC_WORKERS = 8
+
+# Días que se vuelven a pedir antes de la marca de agua (transacciones tardías)
+SYNC_OVERLAP_DAYS = 1
+
+
+def _fetch_transaction_pages(connector, params):
+    """
+    Descargar todas las páginas de una cuenta (hilo del pool, sin ORM)
+    
+    :param connector: TesoteConnector propio de la cuenta
+    :param params: Parámetros de _get_sync_params
+    :return: Lista de páginas de transacciones
+    """
+    return list(connector.iter_transaction_pages(**params))
+
+
 class TesoteAccount(models.Model):
     """Cuenta bancaria de Tesote mapeada a diario Odoo"""
     _name = 'tesote.account'
@@ -38,6 +65,28 @@ class TesoteAccount(models.Model):
     sync_error = fields.Text('Mensaje de Error', readonly=True)
     transaction_count = fields.Integer('Transacciones Importadas', readonly=True)
     
+    # Marca de agua de la sincronización incremental
+    last_transaction_id = fields.Char(
+        'Última Transacción',
+        readonly=True,
+        copy=False,
+        help="ID Tesote de la transacción más reciente importada"
+    )
+    last_transaction_date = fields.Date(
+        'Fecha Última Transacción',
+        readonly=True,
+        copy=False,
+        help="Las sincronizaciones solo piden transacciones desde esta fecha "
+             "(menos un margen de solapamiento)"
+    )
+    sync_resume_state = fields.Text(
+        'Posición de Sincronización',
+        readonly=True,
+        copy=False,
+        help="Página desde la que continúa una sincronización que no recorrió "
+             "todo el rango de fechas (JSON)"
+    )
+    
     # Display name computado
     display_name = fields.Char(compute='_compute_display_name', store=True)
     
@@ -68,8 +117,7 @@ class TesoteAccount(models.Model):
             raise UserError(_("Token de API no configurado"))
         
         # Conectar con API
-        from . import tesote_connector
-        connector = tesote_connector.TesoteConnector(config.api_token, config.api_url)
+        connector = config._get_connector()
         
         # Obtener cuentas con límite
         accounts = connector.get_accounts(limit=50)
@@ -119,80 +167,260 @@ class TesoteAccount(models.Model):
     def action_sync_transactions(self):
         """Sincronizar transacciones de cuentas seleccionadas"""
         # Obtener configuración
-        config = self.env['tesote.config'].search([
-            ('company_id', '=', self.env.company.id)
-        ], limit=1)
+        config_id = self.env.context.get('tesote_config_id')
+        if config_id:
+            config = self.env['tesote.config'].browse(config_id).exists()
+        else:
+            config = self.env['tesote.config'].search([
+                ('company_id', '=', self.env.company.id)
+            ], limit=1)
         
         if not config:
             raise UserError(_("Configure Tesote primero"))
         
-        # Procesar cada cuenta
+        self._sync_accounts({account.id: config for account in self})
+    
+    def _sync_accounts(self, config_by_account):
+        """
+        Sincronizar varias cuentas
+        
+        Con varias cuentas, las páginas se descargan en paralelo en un pool
+        acotado de hilos que solo hacen peticiones HTTP; extractos, marca de
+        agua y posición se escriben en el cursor de la petición, una cuenta
+        tras otra, a medida que termina su descarga. Así dos cuentas del
+        mismo diario no compiten por la numeración ni por las líneas, y la
+        duración de la descarga es la de la cuenta más lenta.
+        
+        :param config_by_account: Diccionario {id de cuenta: tesote.config}
+        """
+        accounts = self.browse()
         for account in self:
             if not account.journal_id:
                 _logger.warning(f"Cuenta {account.display_name} sin diario configurado")
                 continue
-            
-            try:
-                account._sync_transactions(config)
-                account.write({
+            accounts |= account
+        
+        if len(accounts) > 1:
+            accounts._sync_accounts_concurrently(config_by_account)
+            return
+        
+        for account in accounts:
+            account._sync_account(config_by_account[account.id])
+    
+    def _sync_account(self, config, fetched=None):
+        """
+        Sincronizar una cuenta y registrar el resultado
+        
+        :param config: Registro tesote.config
+        :param fetched: Tupla (conector, páginas) ya descargada (opcional)
+        """
+        self.ensure_one()
+        
+        try:
+            # Extracto, posición y marca de agua se confirman o descartan juntos
+            with self.env.cr.savepoint():
+                complete = self._sync_transactions(config, fetched=fetched)
+                vals = {
                     'sync_status': 'success',
                     'sync_error': False,
-                    'last_sync': fields.Datetime.now()
-                })
-            except Exception as e:
-                error_msg = str(e)[:500]
-                _logger.error(f"Error sincronizando {account.display_name}: {error_msg}")
-                account.write({
-                    'sync_status': 'error',
-                    'sync_error': error_msg
-                })
+                }
+                # Un rango incompleto continúa en la próxima sincronización
+                if complete:
+                    vals['last_sync'] = fields.Datetime.now()
+                self.write(vals)
+        except Exception as e:
+            self._set_sync_error(e)
     
-    def _sync_transactions(self, config):
-        """Sincronizar transacciones usando configuración"""
+    def _set_sync_error(self, error):
+        """
+        Registrar el error de una sincronización
+        
+        :param error: Excepción capturada
+        """
         self.ensure_one()
+        error_msg = str(error)[:500]
+        _logger.error(f"Error sincronizando {self.display_name}: {error_msg}")
+        self.write({
+            'sync_status': 'error',
+            'sync_error': error_msg
+        })
+    
+    def _sync_accounts_concurrently(self, config_by_account):
+        """
+        Descargar varias cuentas en paralelo e importarlas una tras otra
+        
+        Cada hilo solo recorre las páginas de su cuenta con un conector
+        propio; la importación se hace en este hilo, con el cursor de la
+        petición. La memoria queda limitada al presupuesto de páginas de
+        cada cuenta descargada y aún no importada.
+        
+        :param config_by_account: Diccionario {id de cuenta: tesote.config}
+        """
+        # Configuración y parámetros se leen antes: los hilos no usan el ORM
+        fetch_args = {}
+        for account in self:
+            config = config_by_account[account.id]
+            fetch_args[account] = (config._get_connector(), account._get_sync_params(config))
+        
+        workers = min(MAX_SYNC_WORKERS, len(self))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tesote_sync') as executor:
+            futures = {
+                executor.submit(_fetch_transaction_pages, connector, params): account
+                for account, (connector, params) in fetch_args.items()
+            }
+            for future in as_completed(futures):
+                account = futures[future]
+                try:
+                    pages = future.result()
+                except Exception as e:
+                    account._set_sync_error(e)
+                    continue
+                account._sync_account(config_by_account[account.id], fetched=(fetch_args[account][0], pages))
         
-        from . import tesote_connector
-        connector = tesote_connector.TesoteConnector(config.api_token, config.api_url)
+        _logger.info(f"Sincronización concurrente de {len(self)} cuentas Tesote con {workers} hilos")
+    
+    def _get_sync_params(self, config):
+        """
+        Parámetros de paginación de la sincronización de la cuenta
+        
+        :param config: Registro tesote.config
+        :return: Diccionario con cuenta, rango de fechas, tamaño de página, presupuesto y posición guardada
+        """
+        self.ensure_one()
         
         # Calcular rango de fechas
-        from datetime import datetime, timedelta
         date_to = datetime.now()
         
-        if self.last_sync:
+        if self.last_transaction_date:
+            # Solo datos nuevos, con margen para transacciones con fecha atrasada
+            date_from = datetime.combine(self.last_transaction_date, datetime.min.time())
+            date_from -= timedelta(days=SYNC_OVERLAP_DAYS)
+        elif self.last_sync:
             date_from = fields.Datetime.from_string(self.last_sync)
         else:
-            days_back = min(config.sync_days, 30)  # Máximo 30 días
-            date_from = date_to - timedelta(days=days_back)
-        
-        # Obtener transacciones con límites seguros
-        transactions = connector.get_transactions(
-            account_id=self.tesote_id,
-            date_from=date_from,
-            date_to=date_to
-        )
+            date_from = date_to - timedelta(days=config.sync_days)
         
-        if not transactions:
-            _logger.info(f"Sin transacciones nuevas para {self.display_name}")
-            return
+        return {
+            'account_id': self.tesote_id,
+            'date_from': date_from,
+            'date_to': date_to,
+            'page_size': config.page_size,
+            'max_transactions': config.max_transactions,
+            'resume': json.loads(self.sync_resume_state) if self.sync_resume_state else None,
+        }
+    
+    def _sync_transactions(self, config, fetched=None):
+        """
+        Sincronizar transacciones usando configuración
         
-        # Crear o actualizar extracto bancario
-        self._create_bank_statement(transactions)
+        Sin páginas ya descargadas, las transacciones se procesan página a
+        página a medida que llegan de la API, sin cargar el rango completo
+        en memoria.
         
-        # Actualizar contador
-        self.transaction_count = len(transactions)
+        :param config: Registro tesote.config
+        :param fetched: Tupla (conector, páginas) ya descargada (opcional)
+        :return: True si se obtuvo el rango completo de fechas
+        """
+        self.ensure_one()
+        
+        if fetched:
+            connector, pages = fetched
+        else:
+            connector = config._get_connector()
+            pages = connector.iter_transaction_pages(**self._get_sync_params(config))
+        
+        created, newest = self._import_transaction_pages(pages)
         
         # Actualizar balance si es posible
-        new_balance = connector.get_account_balance(self.tesote_id)
-        if new_balance is not None:
-            self.balance = new_balance
+        if created:
+            new_balance = connector.get_account_balance(self.tesote_id)
+            if new_balance is not None:
+                self.balance = new_balance
+        
+        self._save_resume_state(connector.resume_state)
+        self._advance_watermark(newest)
+        return not connector.truncated
     
-    def _create_bank_statement(self, transactions):
-        """Crear extracto bancario con transacciones"""
+    def _import_transaction_pages(self, pages):
+        """
+        Crear las líneas de extracto de una secuencia de páginas
+        
+        :param pages: Iterable de listas de transacciones
+        :return: Tupla (líneas creadas, (fecha, id) de la transacción más reciente)
+        """
         self.ensure_one()
         
-        if not transactions:
+        statement = None
+        created = 0
+        newest = None
+        for transactions in pages:
+            statement, page_created = self._create_bank_statement(transactions, statement=statement)
+            created += page_created
+            for txn in transactions:
+                if txn['date'] and (not newest or txn['date'] >= newest[0]):
+                    newest = (txn['date'], txn['id'])
+        
+        if not created:
+            _logger.info(f"Sin transacciones nuevas para {self.display_name}")
+            return 0, newest
+        
+        # Actualizar contador con las líneas realmente creadas
+        self.transaction_count = created
+        _logger.info(f"{created} transacciones importadas para {self.display_name}")
+        return created, newest
+    
+    def _save_resume_state(self, resume_state):
+        """
+        Guardar la posición de una sincronización incompleta
+        
+        La siguiente sincronización continúa desde esa página en lugar de
+        volver a pedir el mismo rango; una sincronización completa la borra.
+        
+        :param resume_state: resume_state del conector o None
+        """
+        self.ensure_one()
+        value = json.dumps(resume_state) if resume_state else False
+        if self.sync_resume_state != value:
+            self.sync_resume_state = value
+    
+    def _advance_watermark(self, newest):
+        """
+        Avanzar la marca de agua hasta la transacción más reciente importada
+        
+        Se escribe en la misma transacción que las líneas del extracto y
+        avanza también tras una sincronización incompleta: mientras haya una
+        posición guardada la siguiente sincronización continúa desde ella y
+        no desde la marca de agua, así que no se salta ninguna transacción.
+        
+        :param newest: Tupla (fecha, id) de la transacción más reciente o None
+        """
+        self.ensure_one()
+        
+        if not newest:
+            return
+        
+        date = fields.Date.to_date(newest[0])
+        if self.last_transaction_date and date < self.last_transaction_date:
             return
         
+        self.write({
+            'last_transaction_date': date,
+            'last_transaction_id': newest[1],
+        })
+    
+    def _create_bank_statement(self, transactions, statement=None):
+        """
+        Crear extracto bancario con transacciones
+        
+        :param transactions: Lista de transacciones normalizadas
+        :param statement: Extracto al que añadir las líneas (páginas siguientes)
+        :return: Tupla (extracto bancario, líneas creadas)
+        """
+        self.ensure_one()
+        
+        if not transactions:
+            return statement, 0
+        
         # Agrupar por fecha
         from collections import defaultdict
         by_date = defaultdict(list)
@@ -202,38 +430,30 @@ class TesoteAccount(models.Model):
             if date:
                 by_date[date].append(txn)
         
-        # Crear extracto
-        dates = sorted(by_date.keys())
-        statement_name = f"TESOTE/{dates[0]}/{dates[-1]}"
-        
-        # Buscar o crear extracto
-        Statement = self.env['account.bank.statement']
-        statement = Statement.search([
-            ('name', '=', statement_name),
-            ('journal_id', '=', self.journal_id.id)
-        ], limit=1)
-        
-        if not statement:
-            statement = Statement.create({
-                'name': statement_name,
-                'journal_id': self.journal_id.id,
-                'date': dates[-1],
-            })
+        if not by_date:
+            return statement, 0
         
-        # Agregar líneas
+        # Transacciones ya importadas en el diario, en una sola consulta
         StatementLine = self.env['account.bank.statement.line']
+        imported_ids = {
+            line['tesote_transaction_id']
+            for line in StatementLine.search_read([
+                ('tesote_journal_id', '=', self.journal_id.id),
+                ('tesote_transaction_id', 'in', [txn['id'] for txn in transactions]),
+            ], ['tesote_transaction_id'])
+        }
+        imported_ids |= self._match_legacy_statement_lines(
+            [txn for txn in transactions if txn['id'] not in imported_ids]
+        )
         
+        # Preparar líneas nuevas
+        dates = sorted(by_date.keys())
+        line_vals = []
         for date_str in dates:
             for txn in by_date[date_str]:
-                # Verificar si ya existe
-                ref = txn.get('reference', txn.get('id'))
-                existing = StatementLine.search([
-                    ('statement_id', '=', statement.id),
-                    ('ref', '=', ref)
-                ], limit=1)
-                
-                if existing:
+                if txn['id'] in imported_ids:
                     continue
+                imported_ids.add(txn['id'])
                 
                 # Determinar monto (positivo = ingreso, negativo = egreso)
                 amount = float(txn.get('amount', 0))
@@ -242,16 +462,96 @@ class TesoteAccount(models.Model):
                 elif txn.get('type') == 'credit':
                     amount = abs(amount)
                 
-                # Crear línea
-                StatementLine.create({
-                    'statement_id': statement.id,
+                line_vals.append({
+                    'journal_id': self.journal_id.id,
                     'date': date_str,
                     'name': txn.get('description', 'Transacción')[:200],
-                    'ref': ref,
+                    'ref': txn.get('reference', txn.get('id')),
                     'amount': amount,
+                    'tesote_transaction_id': txn['id'],
+                    'tesote_journal_id': self.journal_id.id,
+                })
+        
+        if not line_vals:
+            return statement, 0
+        
+        # El extracto cubre solo las fechas de las líneas nuevas
+        dates = sorted({vals['date'] for vals in line_vals})
+        Statement = self.env['account.bank.statement']
+        
+        if statement:
+            # Ampliar el extracto con el rango de la nueva página
+            first, last = dates[0], dates[-1]
+            parts = statement.name.split('/')
+            if len(parts) == 3:
+                first, last = min(parts[1], first), max(parts[2], last)
+            statement_name = f"TESOTE/{first}/{last}"
+            if statement.name != statement_name:
+                statement.write({'name': statement_name, 'date': last})
+        else:
+            # Buscar o crear extracto
+            statement_name = f"TESOTE/{dates[0]}/{dates[-1]}"
+            statement = Statement.search([
+                ('name', '=', statement_name),
+                ('journal_id', '=', self.journal_id.id)
+            ], limit=1)
+            
+            if not statement:
+                statement = Statement.create({
+                    'name': statement_name,
+                    'journal_id': self.journal_id.id,
+                    'date': dates[-1],
+                    'tesote_account_id': self.id,
                 })
         
-        return statement
+        # Crear todas las líneas de la página de una vez
+        for vals in line_vals:
+            vals['statement_id'] = statement.id
+        StatementLine.create(line_vals)
+        
+        return statement, len(line_vals)
+    
+    def _match_legacy_statement_lines(self, transactions):
+        """
+        Reconocer transacciones importadas antes de guardar el ID Tesote
+        
+        Esas líneas solo tienen la referencia de la transacción en ref, dentro
+        de un extracto TESOTE/ del diario. Las que coinciden reciben el ID
+        Tesote, de modo que las siguientes sincronizaciones las encuentran
+        por el índice único.
+        
+        :param transactions: Transacciones no encontradas por ID Tesote
+        :return: Conjunto de IDs Tesote ya importados
+        """
+        self.ensure_one()
+        
+        txn_ids_by_ref = {}
+        for txn in transactions:
+            txn_ids_by_ref.setdefault(txn.get('reference') or txn['id'], txn['id'])
+        if not txn_ids_by_ref:
+            return set()
+        
+        legacy_lines = self.env['account.bank.statement.line'].search([
+            ('journal_id', '=', self.journal_id.id),
+            ('tesote_transaction_id', '=', False),
+            ('statement_id.name', '=like', 'TESOTE/%'),
+            ('ref', 'in', list(txn_ids_by_ref)),
+        ])
+        
+        matched = set()
+        for line in legacy_lines:
+            txn_id = txn_ids_by_ref.pop(line.ref, None)
+            if not txn_id:
+                continue
+            line.write({
+                'tesote_transaction_id': txn_id,
+                'tesote_journal_id': self.journal_id.id,
+            })
+            matched.add(txn_id)
+        
+        if matched:
+            _logger.info(f"{len(matched)} líneas anteriores reconocidas por referencia en {self.display_name}")
+        return matched
     
     @api.model
     def cron_sync_all_accounts(self):
@@ -259,16 +559,19 @@ class TesoteAccount(models.Model):
         # Buscar configuraciones con auto_sync activo
         configs = self.env['tesote.config'].search([('auto_sync', '=', True)])
         
-        for config in configs:
-            accounts = self.search([
-                ('company_id', '=', config.company_id.id),
-                ('journal_id', '!=', False),
-                ('active', '=', True)
-            ])
-            
-            if accounts:
-                _logger.info(f"Sincronización automática: {len(accounts)} cuentas de {config.company_id.name}")
-                accounts.with_context(tesote_config_id=config.id).action_sync_transactions()
+        accounts = self.search([
+            ('company_id', 'in', configs.company_id.ids),
+            ('journal_id', '!=', False),
+            ('active', '=', True)
+        ])
+        
+        if accounts:
+            _logger.info(f"Sincronización automática: {len(accounts)} cuentas de {len(configs)} compañías")
+            config_by_company = {config.company_id.id: config for config in configs}
+            accounts._sync_accounts({
+                account.id: config_by_company[account.company_id.id]
+                for account in accounts
+            })
     
     @api.model
     def process_webhook_transaction(self, account_id, transaction_data):
@@ -1,5 +1,5 @@
 from odoo import models, fields, api, _
-from odoo.exceptions import UserError
+from odoo.exceptions import UserError, ValidationError
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -48,8 +48,24 @@ class TesoteConfig(models.Model):
     )
     max_transactions = fields.Integer(
         string='Límite de Transacciones',
+        default=5000,
+        help="Número máximo de transacciones por sincronización. "
+             "Las restantes se importan en la siguiente sincronización"
+    )
+    page_size = fields.Integer(
+        string='Transacciones por Página',
         default=100,
-        help="Número máximo de transacciones por sincronización"
+        help="Número de transacciones pedidas a la API en cada página (máximo 500)"
+    )
+    rate_limit_per_second = fields.Float(
+        string='Peticiones por Segundo',
+        default=2.0,
+        help="Ritmo máximo de peticiones a la API, compartido por todos los workers del servidor"
+    )
+    rate_limit_burst = fields.Integer(
+        string='Ráfaga Máxima',
+        default=5,
+        help="Peticiones que pueden hacerse seguidas antes de aplicar el ritmo máximo"
     )
     
     # Estado
@@ -71,6 +87,27 @@ class TesoteConfig(models.Model):
         ('company_uniq', 'unique (company_id)', 'Solo puede existir una configuración por compañía'),
     ]
     
+    @api.constrains('rate_limit_per_second', 'rate_limit_burst')
+    def _check_rate_limit(self):
+        for record in self:
+            if record.rate_limit_per_second <= 0 or record.rate_limit_burst < 1:
+                raise ValidationError(_("El límite de peticiones y la ráfaga deben ser mayores que cero"))
+    
+    def _get_connector(self):
+        """
+        Conector de la API con el token y los límites de esta configuración
+        
+        :return: TesoteConnector
+        """
+        self.ensure_one()
+        from ..models import tesote_connector
+        return tesote_connector.TesoteConnector(
+            self.api_token,
+            self.api_url,
+            rate_limit=self.rate_limit_per_second,
+            rate_burst=self.rate_limit_burst,
+        )
+    
     @api.depends('company_id')
     def _compute_webhook_url(self):
         """Generar URL del webhook para configurar en Tesote"""
@@ -87,8 +124,7 @@ class TesoteConfig(models.Model):
             raise UserError(_("Por favor configure el token de API"))
         
         try:
-            from ..models import tesote_connector
-            connector = tesote_connector.TesoteConnector(self.api_token, self.api_url)
+            connector = self._get_connector()
             
             if connector.test_connection():
                 self.write({
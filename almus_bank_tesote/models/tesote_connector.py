@@ -4,10 +4,15 @@
 
 import requests
 import logging
+import threading
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
 import time
 
+from .tesote_rate_limiter import TesoteRateLimiter
+
 _logger = logging.getLogger(__name__)
 
 
@@ -20,18 +25,43 @@ class TesoteConnector:
     # Constantes de seguridad
     MAX_RETRIES = 2  # Máximo 2 reintentos
     TIMEOUT_SECONDS = 10  # Timeout corto de 10 segundos
-    MAX_TRANSACTIONS_PER_SYNC = 100  # Límite de transacciones por sincronización
-    MIN_REQUEST_INTERVAL = 1.0  # 1 segundo mínimo entre requests
     
-    def __init__(self, token: str, base_url: str = 'https://equipo.tesote.com/api/v2'):
+    # Paginación de transacciones
+    PAGE_SIZE = 100  # Transacciones por página
+    MAX_PAGE_SIZE = 500  # Tamaño máximo de página aceptado
+    MAX_PAGES_PER_SYNC = 50  # Presupuesto de páginas por sincronización
+    MAX_SYNC_DAYS = 366  # Ventana máxima de fechas con paginación
+    
+    # Límites compartidos por todas las instancias
+    MAX_CONCURRENT_PER_HOST = 4  # Requests simultáneos por host (por proceso)
+    RATE_LIMIT_PER_SECOND = 2.0  # Tokens por segundo por host (entre procesos)
+    RATE_LIMIT_BURST = 5  # Ráfaga máxima de requests por host
+    RATE_LIMIT_MAX_WAIT = 30  # Segundos máximos de espera por un token
+    DEFAULT_RETRY_AFTER = 5  # Espera ante un 429 sin cabecera Retry-After
+    MAX_RETRY_AFTER = 30  # Retry-After mayor a este valor no se reintenta
+    
+    _host_lock = threading.Lock()
+    _host_semaphores = {}
+    
+    def __init__(self, token: str, base_url: str = 'https://equipo.tesote.com/api/v2',
+                 rate_limit: float = None, rate_burst: int = None):
         """
         Inicializar conector con medidas de seguridad
         
         :param token: Bearer token para autenticación
         :param base_url: URL base de la API
+        :param rate_limit: Peticiones por segundo al host (RATE_LIMIT_PER_SECOND por defecto)
+        :param rate_burst: Ráfaga máxima de peticiones (RATE_LIMIT_BURST por defecto)
         """
         self.token = token
         self.base_url = base_url.rstrip('/')
+        self.host = urlparse(self.base_url).netloc
+        self.host_semaphore = self._get_host_semaphore(self.host)
+        self.rate_limiter = TesoteRateLimiter(
+            self.host,
+            rate_limit or self.RATE_LIMIT_PER_SECOND,
+            rate_burst or self.RATE_LIMIT_BURST,
+        )
         
         # Sesión HTTP con configuración segura
         self.session = requests.Session()
@@ -42,22 +72,43 @@ class TesoteConnector:
             'X-Client': 'Odoo-Almus-Tesote/1.0',
         })
         
-        # Control de rate limiting y anti-bucle
-        self.last_request_time = None
+        # Contadores de la sesión
         self.request_count = 0
-        self.max_requests_per_session = 20  # Límite de requests por sesión
-        
-    def _check_rate_limit(self):
-        """Verificar y aplicar límites de tasa"""
-        # Verificar límite de requests por sesión
-        if self.request_count >= self.max_requests_per_session:
-            raise Exception(f"Límite de {self.max_requests_per_session} requests alcanzado. Previniendo bucle.")
-        
-        # Aplicar intervalo mínimo entre requests
-        if self.last_request_time:
-            elapsed = (datetime.now() - self.last_request_time).total_seconds()
-            if elapsed < self.MIN_REQUEST_INTERVAL:
-                time.sleep(self.MIN_REQUEST_INTERVAL - elapsed)
+        self.truncated = False  # La última paginación no recorrió todo el rango
+        self.resume_state = None  # Posición desde la que continuar la paginación
+        
+    @classmethod
+    def _get_host_semaphore(cls, host: str) -> threading.BoundedSemaphore:
+        """
+        Semáforo que limita los requests simultáneos a un host
+        
+        :param host: Host de la API
+        :return: Semáforo compartido por todas las instancias
+        """
+        with cls._host_lock:
+            if host not in cls._host_semaphores:
+                cls._host_semaphores[host] = threading.BoundedSemaphore(cls.MAX_CONCURRENT_PER_HOST)
+            return cls._host_semaphores[host]
+    
+    def _retry_after_seconds(self, response) -> float:
+        """
+        Segundos de espera indicados por la cabecera Retry-After
+        
+        :param response: Respuesta HTTP 429
+        :return: Segundos (acepta segundos o fecha HTTP)
+        """
+        value = response.headers.get('Retry-After')
+        if not value:
+            return self.DEFAULT_RETRY_AFTER
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, retry_at.timestamp() - time.time())
+        except (TypeError, ValueError):
+            return self.DEFAULT_RETRY_AFTER
     
     def _make_request(self, method: str, endpoint: str, retry_count: int = 0, **kwargs) -> Optional[Dict]:
         """
@@ -73,32 +124,33 @@ class TesoteConnector:
             _logger.error(f"Máximo de reintentos alcanzado para {endpoint}")
             return None
         
-        # Aplicar rate limiting
-        try:
-            self._check_rate_limit()
-        except Exception as e:
-            _logger.error(str(e))
+        # Aplicar rate limiting compartido (token bucket por host)
+        if not self.rate_limiter.acquire(self.RATE_LIMIT_MAX_WAIT):
             return None
         
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
         
         try:
-            # Request con timeout corto
-            response = self.session.request(
-                method=method,
-                url=url,
-                timeout=self.TIMEOUT_SECONDS,
-                **kwargs
-            )
+            # Request con timeout corto, limitado por host entre hilos
+            with self.host_semaphore:
+                response = self.session.request(
+                    method=method,
+                    url=url,
+                    timeout=self.TIMEOUT_SECONDS,
+                    **kwargs
+                )
             
             # Actualizar contadores
-            self.last_request_time = datetime.now()
             self.request_count += 1
             
             # Manejar respuestas de error
             if response.status_code == 429:  # Rate limit de la API
-                _logger.warning(f"Rate limit alcanzado en Tesote API")
-                # NO reintentar para evitar bucles
+                retry_after = self._retry_after_seconds(response)
+                _logger.warning(f"Rate limit alcanzado en Tesote API, Retry-After {retry_after:.0f}s")
+                # Pausar a todas las instancias; el reintento espera su token
+                self.rate_limiter.block(retry_after)
+                if retry_after <= self.MAX_RETRY_AFTER:
+                    return self._make_request(method, endpoint, retry_count + 1, **kwargs)
                 return None
             
             if response.status_code == 401:  # Token inválido
@@ -194,44 +246,195 @@ class TesoteConnector:
         return valid_accounts
     
     def get_transactions(self, account_id: str, date_from: datetime = None, 
-                        date_to: datetime = None) -> List[Dict]:
+                        date_to: datetime = None, max_transactions: int = None) -> List[Dict]:
         """
-        Obtener transacciones con límites estrictos
+        Obtener todas las transacciones del rango recorriendo las páginas
+        
+        Para volúmenes grandes es preferible consumir iter_transaction_pages
+        directamente y procesar página a página.
         
         :param account_id: ID de la cuenta en Tesote
-        :param date_from: Fecha inicial (máximo 30 días atrás)
+        :param date_from: Fecha inicial
         :param date_to: Fecha final
-        :return: Lista de transacciones limitada
+        :param max_transactions: Presupuesto total de transacciones (opcional)
+        :return: Lista de transacciones
         """
-        # Validar y limitar rango de fechas
-        if not date_to:
-            date_to = datetime.now()
-        if not date_from:
-            date_from = date_to - timedelta(days=7)  # Por defecto solo 7 días
-        
-        # Limitar a máximo 30 días para evitar cargas excesivas
-        max_days = 30
-        delta = (date_to - date_from).days
-        if delta > max_days:
-            date_from = date_to - timedelta(days=max_days)
-            _logger.warning(f"Rango de fechas limitado a {max_days} días")
-        
-        # Parámetros con límites estrictos
-        params = {
-            'start_date': date_from.strftime('%Y-%m-%d'),
-            'end_date': date_to.strftime('%Y-%m-%d'),
-            'limit': self.MAX_TRANSACTIONS_PER_SYNC,  # Límite fijo
-        }
+        transactions = []
+        for page in self.iter_transaction_pages(account_id, date_from, date_to,
+                                                max_transactions=max_transactions):
+            transactions.extend(page)
         
-        response = self._make_request(
-            'GET', 
-            f'/accounts/{account_id}/transactions',
-            params=params
-        )
+        _logger.info(f"Obtenidas {len(transactions)} transacciones para cuenta {account_id}")
+        return transactions
+    
+    def iter_transaction_pages(self, account_id: str, date_from: datetime = None,
+                               date_to: datetime = None, page_size: int = None,
+                               max_transactions: int = None, resume: Dict = None) -> Iterator[List[Dict]]:
+        """
+        Generador de páginas de transacciones
         
-        if not response:
-            return []
+        Recorre la API página a página (cursor si la API lo devuelve, número
+        de página en caso contrario) y entrega cada página ya normalizada,
+        de modo que el consumidor procesa las transacciones sin mantener la
+        respuesta completa en memoria. Los rangos de más de MAX_SYNC_DAYS
+        días se recorren en ventanas sucesivas.
+        
+        Si se agota el presupuesto, falla una petición o queda otra ventana
+        por recorrer, el atributo truncated queda en True y resume_state
+        guarda la posición siguiente; pasándola en resume, la próxima
+        llamada continúa desde ahí en lugar de repetir las primeras páginas.
         
+        :param account_id: ID de la cuenta en Tesote
+        :param date_from: Fecha inicial
+        :param date_to: Fecha final
+        :param page_size: Transacciones por página (máximo MAX_PAGE_SIZE)
+        :param max_transactions: Presupuesto total de transacciones (opcional)
+        :param resume: resume_state de una paginación anterior (ignora fechas y tamaño)
+        :return: Iterador de listas de transacciones
+        """
+        if resume:
+            params = dict(resume['params'])
+            end_date = resume['end_date']
+        else:
+            if not date_to:
+                date_to = datetime.now()
+            if not date_from:
+                date_from = date_to - timedelta(days=7)
+            end_date = date_to.strftime('%Y-%m-%d')
+            params = {
+                'start_date': date_from.strftime('%Y-%m-%d'),
+                'end_date': end_date,
+                'limit': max(1, min(page_size or self.PAGE_SIZE, self.MAX_PAGE_SIZE)),
+                'page': 1,
+            }
+        params = self._window_params(params, end_date)
+        
+        page_size = params['limit']
+        budget = max_transactions or page_size * self.MAX_PAGES_PER_SYNC
+        
+        self.request_count = 0
+        self.truncated = False
+        self.resume_state = None
+        
+        def stop(next_params):
+            """Marcar el rango como incompleto y recordar desde dónde continuar"""
+            self.truncated = True
+            self.resume_state = {'params': next_params, 'end_date': end_date}
+        
+        fetched = 0
+        previous_first_id = None
+        for _page in range(self.MAX_PAGES_PER_SYNC):
+            response = self._make_request(
+                'GET',
+                f'/accounts/{account_id}/transactions',
+                params=params
+            )
+            if response is None:
+                # Petición fallida: se reintenta la misma página la próxima vez
+                stop(params)
+                return
+            
+            transactions = self._parse_transactions(response)
+            
+            # Protección contra APIs que ignoran la paginación
+            if transactions and transactions[0]['id'] == previous_first_id:
+                _logger.warning(f"Página repetida para cuenta {account_id}, deteniendo paginación")
+                transactions = []
+            
+            next_params = None
+            if transactions:
+                previous_first_id = transactions[0]['id']
+                fetched += len(transactions)
+                # Páginas completas: la siguiente página empieza justo después
+                yield transactions
+                next_params = self._next_page_params(response, params, len(transactions), page_size)
+            
+            if not next_params:
+                # Fin de la ventana: continuar con la siguiente si el rango era mayor
+                next_window = self._next_window_params(params, end_date)
+                if next_window:
+                    stop(next_window)
+                    _logger.warning(f"Rango de fechas limitado a {self.MAX_SYNC_DAYS} días, "
+                                    f"se continuará desde {next_window['start_date']}")
+                return
+            
+            params = next_params
+            if fetched >= budget:
+                stop(params)
+                _logger.warning(f"Presupuesto de {budget} transacciones alcanzado para cuenta {account_id}")
+                return
+        
+        stop(params)
+        _logger.warning(f"Límite de {self.MAX_PAGES_PER_SYNC} páginas alcanzado para cuenta {account_id}")
+    
+    def _window_params(self, params: Dict, end_date: str) -> Dict:
+        """
+        Limitar la ventana de fechas de una petición a MAX_SYNC_DAYS días
+        
+        :param params: Parámetros de la página
+        :param end_date: Fecha final del rango completo (YYYY-MM-DD)
+        :return: Parámetros con end_date limitado
+        """
+        start = datetime.strptime(params['start_date'], '%Y-%m-%d')
+        window_end = start + timedelta(days=self.MAX_SYNC_DAYS)
+        return dict(params, end_date=min(end_date, window_end.strftime('%Y-%m-%d')))
+    
+    def _next_window_params(self, params: Dict, end_date: str) -> Optional[Dict]:
+        """
+        Parámetros de la primera página de la ventana siguiente
+        
+        :param params: Parámetros de la ventana actual
+        :param end_date: Fecha final del rango completo (YYYY-MM-DD)
+        :return: Parámetros o None si la ventana actual llega al final del rango
+        """
+        if params['end_date'] >= end_date:
+            return None
+        start = datetime.strptime(params['end_date'], '%Y-%m-%d') + timedelta(days=1)
+        next_params = {k: v for k, v in params.items() if k != 'cursor'}
+        next_params.update(start_date=start.strftime('%Y-%m-%d'), page=1)
+        return self._window_params(next_params, end_date)
+    
+    def _next_page_params(self, response, params: Dict, count: int, page_size: int) -> Optional[Dict]:
+        """
+        Calcular parámetros de la siguiente página
+        
+        :param response: Respuesta JSON de la página actual
+        :param params: Parámetros de la página actual
+        :param count: Transacciones recibidas en la página actual
+        :param page_size: Tamaño de página solicitado
+        :return: Parámetros de la siguiente página o None si no hay más
+        """
+        meta = {}
+        if isinstance(response, dict):
+            meta = response.get('meta') or response.get('pagination') or {}
+            cursor = response.get('next_cursor') or meta.get('next_cursor')
+            if cursor:
+                next_params = {k: v for k, v in params.items() if k != 'page'}
+                next_params['cursor'] = cursor
+                return next_params
+        
+        if 'cursor' in params:
+            # Paginación por cursor sin cursor siguiente: última página
+            return None
+        
+        if meta.get('has_more') is False:
+            return None
+        total_pages = meta.get('total_pages')
+        if total_pages and params['page'] >= int(total_pages):
+            return None
+        
+        # Sin metadatos: una página incompleta es la última
+        if count < page_size and not meta.get('has_more'):
+            return None
+        return dict(params, page=params['page'] + 1)
+    
+    def _parse_transactions(self, response) -> List[Dict]:
+        """
+        Extraer y normalizar transacciones de una respuesta
+        
+        :param response: Respuesta JSON de la API
+        :return: Lista de transacciones con campos esenciales
+        """
         # Extraer transacciones
         if isinstance(response, dict) and 'data' in response:
             transactions = response.get('data', [])
@@ -240,9 +443,8 @@ class TesoteConnector:
         else:
             return []
         
-        # Limitar y procesar transacciones
         valid_transactions = []
-        for txn in transactions[:self.MAX_TRANSACTIONS_PER_SYNC]:
+        for txn in transactions:
             if not isinstance(txn, dict) or not txn.get('id'):
                 continue
             
@@ -256,7 +458,6 @@ class TesoteConnector:
                 'type': str(txn.get('type', 'other'))[:10],
             })
         
-        _logger.info(f"Obtenidas {len(valid_transactions)} transacciones para cuenta {account_id}")
         return valid_transactions
     
     def get_account_balance(self, account_id: str) -> Optional[float]:
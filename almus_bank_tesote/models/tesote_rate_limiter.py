@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# Almus Dev (JDV-ALM) - www.almus.dev
+# Limitador de tasa token-bucket compartido entre procesos
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from odoo.tools import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: el estado solo se comparte dentro del proceso
+    fcntl = None
+
+_logger = logging.getLogger(__name__)
+
+
+class TesoteRateLimiter:
+    """
+    Token bucket por host de la API
+    
+    El estado (tokens disponibles, última recarga y bloqueo por Retry-After)
+    se guarda en un archivo protegido con flock, de modo que todas las
+    instancias del conector, los hilos y los workers de Odoo de la misma
+    máquina comparten el mismo presupuesto. El archivo vive en un
+    subdirectorio privado del data_dir de Odoo y solo el usuario del
+    servidor puede leerlo o escribirlo.
+    """
+    
+    _thread_lock = threading.Lock()
+    
+    def __init__(self, host: str, rate: float, capacity: float):
+        """
+        :param host: Host de la API (una cubeta por host)
+        :param rate: Tokens recargados por segundo
+        :param capacity: Tamaño máximo de la ráfaga
+        """
+        self.host = host
+        self.rate = rate
+        self.capacity = capacity
+        digest = hashlib.sha1(host.encode()).hexdigest()[:16]
+        self.path = os.path.join(self._get_state_dir(), f'{digest}.json')
+    
+    @staticmethod
+    def _get_state_dir() -> str:
+        """
+        Directorio de los archivos de estado, creado con permisos 0700
+        
+        :return: Ruta del directorio
+        """
+        path = os.path.join(config['data_dir'], 'tesote_rate_limit')
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        return path
+    
+    def _open_state_file(self):
+        """
+        Abrir el archivo de estado sin seguir enlaces simbólicos
+        
+        :return: Archivo abierto en lectura y escritura, creado con permisos 0600
+        """
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0)
+        return os.fdopen(os.open(self.path, flags, 0o600), 'r+')
+    
+    def _update(self, callback):
+        """
+        Leer, modificar y guardar el estado bajo bloqueo exclusivo
+        
+        :param callback: Función que recibe el estado y devuelve un resultado
+        :return: Resultado del callback
+        """
+        with self._thread_lock:
+            with self._open_state_file() as state_file:
+                if fcntl:
+                    fcntl.flock(state_file, fcntl.LOCK_EX)
+                try:
+                    state_file.seek(0)
+                    try:
+                        state = json.loads(state_file.read() or '{}')
+                    except ValueError:
+                        state = {}
+                    
+                    now = time.time()
+                    updated = state.get('updated', now)
+                    state['tokens'] = min(
+                        self.capacity,
+                        state.get('tokens', self.capacity) + max(0.0, now - updated) * self.rate
+                    )
+                    state['updated'] = now
+                    result = callback(state, now)
+                    
+                    state_file.seek(0)
+                    state_file.truncate()
+                    state_file.write(json.dumps(state))
+                    state_file.flush()
+                    return result
+                finally:
+                    if fcntl:
+                        fcntl.flock(state_file, fcntl.LOCK_UN)
+    
+    def acquire(self, timeout: float) -> bool:
+        """
+        Consumir un token, esperando a que haya uno disponible
+        
+        :param timeout: Segundos máximos de espera
+        :return: True si se obtuvo el token
+        """
+        def take(state, now):
+            blocked_until = state.get('blocked_until', 0.0)
+            if now < blocked_until:
+                return blocked_until - now
+            if state['tokens'] >= 1:
+                state['tokens'] -= 1
+                return 0.0
+            return (1 - state['tokens']) / self.rate
+        
+        deadline = time.time() + timeout
+        while True:
+            wait = self._update(take)
+            if not wait:
+                return True
+            if time.time() + wait > deadline:
+                _logger.warning(f"Sin tokens de rate limit para {self.host} en {timeout}s")
+                return False
+            time.sleep(wait)
+    
+    def block(self, seconds: float):
+        """
+        Suspender todos los requests al host (respuesta 429 con Retry-After)
+        
+        :param seconds: Segundos de bloqueo
+        """
+        def set_blocked(state, now):
+            state['blocked_until'] = max(state.get('blocked_until', 0.0), now + seconds)
+            state['tokens'] = 0.0
+        
+        self._update(set_blocked)
\ No newline at end of file
@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+from . import test_tesote_connector
+from . import test_tesote_sync
\ No newline at end of file
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Almus Dev (JDV-ALM) - www.almus.dev
+# Pruebas de la paginación del conector Tesote con una API simulada
+
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.almus_bank_tesote.models.tesote_connector import TesoteConnector
+
+
+@tagged('post_install', '-at_install')
+class TestTesoteConnectorPagination(TransactionCase):
+    """Paginación por cursor, presupuesto y ventanas de fechas"""
+    
+    def setUp(self):
+        super().setUp()
+        self.connector = TesoteConnector('test-token', 'https://tesote.test/api/v2')
+        self.requests = []
+        # Tres páginas enlazadas por cursor
+        self.cursor_pages = {
+            None: ([{'id': 'a1', 'date': '2025-01-01'}, {'id': 'a2', 'date': '2025-01-02'}], 'c2'),
+            'c2': ([{'id': 'b1', 'date': '2025-01-03'}, {'id': 'b2', 'date': '2025-01-04'}], 'c3'),
+            'c3': ([{'id': 'c1', 'date': '2025-01-05'}], None),
+        }
+        # Cursores cuya respuesta es una lista sin metadatos
+        self.bare_list_cursors = set()
+    
+    def _fake_request(self, connector, method, endpoint, retry_count=0, **kwargs):
+        params = kwargs['params']
+        self.requests.append(dict(params))
+        data, next_cursor = self.cursor_pages.get(params.get('cursor'), ([], None))
+        if params.get('cursor') in self.bare_list_cursors:
+            return data
+        return {'data': data, 'meta': {'next_cursor': next_cursor}}
+    
+    def _pages(self, **kwargs):
+        with patch.object(TesoteConnector, '_make_request', autospec=True, side_effect=self._fake_request):
+            return [
+                [txn['id'] for txn in page]
+                for page in self.connector.iter_transaction_pages('acc-1', **kwargs)
+            ]
+    
+    def test_cursor_pagination(self):
+        """Las páginas siguientes se piden con el cursor devuelto por la API"""
+        pages = self._pages(date_from=datetime(2025, 1, 1), date_to=datetime(2025, 1, 31), page_size=2)
+        self.assertEqual(pages, [['a1', 'a2'], ['b1', 'b2'], ['c1']])
+        self.assertNotIn('cursor', self.requests[0])
+        self.assertEqual([params.get('cursor') for params in self.requests[1:]], ['c2', 'c3'])
+        self.assertNotIn('page', self.requests[1], "Con cursor no se envía número de página")
+        self.assertFalse(self.connector.truncated)
+        self.assertIsNone(self.connector.resume_state)
+    
+    def test_cursor_response_without_metadata(self):
+        """Una página completa sin cursor siguiente termina la paginación por cursor"""
+        self.bare_list_cursors = {'c2'}
+        pages = self._pages(date_from=datetime(2025, 1, 1), date_to=datetime(2025, 1, 31), page_size=2)
+        self.assertEqual(pages, [['a1', 'a2'], ['b1', 'b2']])
+        self.assertEqual(len(self.requests), 2)
+        self.assertFalse(self.connector.truncated)
+    
+    def test_budget_resumes_at_cursor(self):
+        """Un corte por presupuesto guarda el cursor de la página siguiente"""
+        pages = self._pages(date_from=datetime(2025, 1, 1), date_to=datetime(2025, 1, 31),
+                            page_size=2, max_transactions=2)
+        self.assertEqual(pages, [['a1', 'a2']])
+        self.assertTrue(self.connector.truncated)
+        self.assertEqual(self.connector.resume_state['params']['cursor'], 'c2')
+        
+        pages = self._pages(resume=self.connector.resume_state)
+        self.assertEqual(pages, [['b1', 'b2'], ['c1']])
+        self.assertFalse(self.connector.truncated)
+    
+    def test_long_range_walked_in_windows(self):
+        """Un rango mayor que MAX_SYNC_DAYS se recorre en ventanas sucesivas"""
+        date_from = datetime(2023, 1, 1)
+        date_to = date_from + timedelta(days=TesoteConnector.MAX_SYNC_DAYS * 2)
+        self.cursor_pages = {None: ([], None)}
+        
+        self._pages(date_from=date_from, date_to=date_to)
+        window_end = (date_from + timedelta(days=TesoteConnector.MAX_SYNC_DAYS)).strftime('%Y-%m-%d')
+        self.assertEqual(self.requests[0]['end_date'], window_end)
+        self.assertTrue(self.connector.truncated, "El resto del rango queda pendiente")
+        
+        resume = self.connector.resume_state
+        next_start = (date_from + timedelta(days=TesoteConnector.MAX_SYNC_DAYS + 1)).strftime('%Y-%m-%d')
+        self.assertEqual(resume['params']['start_date'], next_start)
+        
+        self._pages(resume=resume)
+        self.assertEqual(self.requests[-1]['end_date'], date_to.strftime('%Y-%m-%d'))
+        self.assertFalse(self.connector.truncated)
\ No newline at end of file
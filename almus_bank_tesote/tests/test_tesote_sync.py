@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# Almus Dev (JDV-ALM) - www.almus.dev
+# Pruebas de la sincronización de transacciones con una API Tesote simulada
+
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.almus_bank_tesote.models.tesote_connector import TesoteConnector
+
+
+class TesoteSyncCommon(TransactionCase):
+    """Cuenta Tesote con diario y una API simulada paginada por número de página"""
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.journal = cls.env['account.journal'].create({
+            'name': 'Banco Tesote',
+            'type': 'bank',
+            'code': 'BTST',
+        })
+        cls.config = cls.env['tesote.config'].create({
+            'api_token': 'test-token',
+            'page_size': 2,
+            'auto_sync': False,
+        })
+        cls.account = cls.env['tesote.account'].create({
+            'tesote_id': 'acc-1',
+            'bank_name': 'Banco Prueba',
+            'journal_id': cls.journal.id,
+        })
+        today = date.today()
+        cls.api_transactions = [
+            {
+                'id': f'txn-{index}',
+                'date': (today - timedelta(days=5 - index)).isoformat(),
+                'amount': 10.0 * (index + 1),
+                'description': f'Movimiento {index}',
+                'type': 'credit',
+            }
+            for index in range(5)
+        ]
+    
+    def setUp(self):
+        super().setUp()
+        self.requests = []
+    
+    def _fake_request(self, connector, method, endpoint, retry_count=0, **kwargs):
+        """Responder como la API: una página de api_transactions por número de página"""
+        params = kwargs['params']
+        self.requests.append(dict(params))
+        size, page = params['limit'], params['page']
+        return {
+            'data': self.api_transactions[(page - 1) * size:page * size],
+            'meta': {'total_pages': -(-len(self.api_transactions) // size)},
+        }
+    
+    def _sync(self, max_pages=TesoteConnector.MAX_PAGES_PER_SYNC):
+        self.requests = []
+        with patch.object(TesoteConnector, '_make_request', autospec=True, side_effect=self._fake_request), \
+                patch.object(TesoteConnector, 'get_account_balance', return_value=None), \
+                patch.object(TesoteConnector, 'MAX_PAGES_PER_SYNC', max_pages):
+            self.account._sync_accounts({self.account.id: self.config})
+    
+    def _imported_ids(self):
+        return set(self.env['account.bank.statement.line'].search([
+            ('tesote_journal_id', '=', self.journal.id),
+        ]).mapped('tesote_transaction_id'))
+
+
+@tagged('post_install', '-at_install')
+class TestTesoteSync(TesoteSyncCommon):
+    
+    def test_truncated_sync_progresses(self):
+        """Una sincronización cortada por el presupuesto continúa en la siguiente"""
+        self._sync(max_pages=2)
+        self.assertEqual(self._imported_ids(), {'txn-0', 'txn-1', 'txn-2', 'txn-3'})
+        self.assertTrue(self.account.sync_resume_state)
+        self.assertFalse(self.account.last_sync, "Un rango incompleto no cuenta como sincronizado")
+        self.assertEqual(str(self.account.last_transaction_date), self.api_transactions[3]['date'])
+        
+        self._sync(max_pages=2)
+        self.assertEqual(self.requests[0]['page'], 3, "La segunda sincronización debe continuar en la página 3")
+        self.assertEqual(self._imported_ids(), {txn['id'] for txn in self.api_transactions})
+        self.assertFalse(self.account.sync_resume_state)
+        self.assertTrue(self.account.last_sync)
+        self.assertEqual(str(self.account.last_transaction_date), self.api_transactions[4]['date'])
+        self.assertEqual(self.account.sync_status, 'success')
+    
+    def test_sync_does_not_duplicate_lines(self):
+        """Transacciones repetidas en una página o entre sincronizaciones crean una sola línea"""
+        self.api_transactions = self.api_transactions[:1] + self.api_transactions
+        self._sync()
+        self.account.sync_resume_state = False
+        self._sync()
+        
+        lines = self.env['account.bank.statement.line'].search([('tesote_journal_id', '=', self.journal.id)])
+        self.assertEqual(len(lines), len({txn['id'] for txn in self.api_transactions}))
+    
+    def test_transaction_count_created_lines(self):
+        """transaction_count cuenta las líneas creadas, no las transacciones repetidas"""
+        self._sync(max_pages=1)
+        self.assertEqual(self.account.transaction_count, 2)
+        
+        # Volver a pedir el rango completo: las dos primeras ya están importadas
+        self.account.sync_resume_state = False
+        self._sync()
+        self.assertEqual(self._imported_ids(), {txn['id'] for txn in self.api_transactions})
+        self.assertEqual(self.account.transaction_count, 3)
+    
+    def test_accounts_same_journal_synced_together(self):
+        """Dos cuentas del mismo diario se descargan en paralelo y se importan una tras otra"""
+        other_account = self.env['tesote.account'].create({
+            'tesote_id': 'acc-2',
+            'bank_name': 'Banco Prueba',
+            'journal_id': self.journal.id,
+        })
+        accounts = self.account | other_account
+        with patch.object(TesoteConnector, '_make_request', autospec=True, side_effect=self._fake_request), \
+                patch.object(TesoteConnector, 'get_account_balance', return_value=None):
+            accounts._sync_accounts({account.id: self.config for account in accounts})
+        
+        self.assertEqual(accounts.mapped('sync_status'), ['success', 'success'])
+        lines = self.env['account.bank.statement.line'].search([('tesote_journal_id', '=', self.journal.id)])
+        self.assertEqual(len(lines), len(self.api_transactions), "Las transacciones comunes se importan una vez")
+    
+    def test_legacy_lines_matched_by_reference(self):
+        """Las líneas importadas sin ID Tesote se reconocen por su referencia"""
+        legacy_txn = self.api_transactions[0]
+        statement = self.env['account.bank.statement'].create({
+            'name': f"TESOTE/{legacy_txn['date']}/{legacy_txn['date']}",
+            'journal_id': self.journal.id,
+        })
+        legacy_line = self.env['account.bank.statement.line'].create({
+            'statement_id': statement.id,
+            'journal_id': self.journal.id,
+            'date': legacy_txn['date'],
+            'payment_ref': legacy_txn['description'],
+            'ref': legacy_txn['id'],
+            'amount': legacy_txn['amount'],
+        })
+        
+        self._sync()
+        lines = self.env['account.bank.statement.line'].search([('journal_id', '=', self.journal.id)])
+        self.assertEqual(len(lines), len(self.api_transactions), "La transacción antigua no debe duplicarse")
+        self.assertEqual(legacy_line.tesote_transaction_id, legacy_txn['id'])
+        self.assertEqual(legacy_line.tesote_journal_id, self.journal)
+        self.assertEqual(self.account.transaction_count, len(self.api_transactions) - 1)
\ No newline at end of file
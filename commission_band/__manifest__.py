@@ -40,6 +40,7 @@ Componentes Principales:
         'sales_team',
         'sale_management',
         'web',
+        'bus',
     ],
     'external_dependencies': {
         'python': ['xlsxwriter'],
@@ -60,6 +61,8 @@ Componentes Principales:
         'views/commission_batch_views.xml',
         'views/commission_payment_document_views.xml',
         'views/commission_calculation_batch_views.xml',
+        'views/commission_job_views.xml',
+        'views/commission_report_views.xml',
         'views/res_users_views.xml',
         'views/commission_band_menu.xml',
         
@@ -67,10 +70,16 @@ Componentes Principales:
         'wizards/commission_band_config_wizard_views.xml',
         'wizards/commission_batch_create_wizard_views.xml',
         'wizards/commission_payment_export_wizard_views.xml',
+        'wizards/commission_recalculate_wizard_views.xml',
         
         # Reports
         'reports/commission_payment_report.xml',
     ],
+    'assets': {
+        'web.assets_backend': [
+            'commission_band/static/src/js/commission_job_progress.js',
+        ],
+    },
     'demo': [],
     'installable': True,
     'application': False,
@@ -9,4 +9,10 @@ from . import res_users
 from . import account_payment
 from . import account_move
 from . import commission_batch
-from . import commission_payment_document
\ No newline at end of file
+from . import commission_payment_document
+from . import res_currency
+from . import commission_job
+from . import commission_payment_queue
+from . import commission_sweep_state
+from . import commission_salesperson_summary
+from . import commission_report
\ No newline at end of file
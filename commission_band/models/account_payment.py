@@ -1,10 +1,19 @@
 # -*- coding: utf-8 -*-
 
 from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+from odoo.tools.sql import column_exists, create_column, table_exists
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# commission.sweep.state key of the last payment id processed by the pending-commission cron
+PENDING_COMMISSION_SWEEP_KEY = 'pending_commission_payments'
+
+# Key of the dirty payment ids collected in the cursor precommit data
+DIRTY_COMMISSION_PAYMENTS_KEY = 'commission_band.dirty_payment_ids'
+
 
 class AccountPayment(models.Model):
     _inherit = 'account.payment'
@@ -29,6 +38,14 @@ class AccountPayment(models.Model):
         help="Indicates if this payment has generated commission calculations"
     )
     
+    has_valid_commission = fields.Boolean(
+        string='Has Valid Commission',
+        compute='_compute_has_valid_commission',
+        store=True,
+        index=True,
+        help="Indicates if this payment has at least one non-cancelled commission calculation"
+    )
+    
     total_commission_amount = fields.Monetary(
         string='Total Commission',
         compute='_compute_total_commission',
@@ -54,8 +71,37 @@ class AccountPayment(models.Model):
             payment.commission_calculation_count = len(payment.commission_calculation_ids)
             payment.has_commission_calculations = bool(payment.commission_calculation_ids)
 
+    @api.depends('commission_calculation_ids.state')
+    def _compute_has_valid_commission(self):
+        for payment in self:
+            payment.has_valid_commission = any(
+                calc.state != 'cancelled' for calc in payment.commission_calculation_ids
+            )
+
+    def _auto_init(self):
+        """Initialize has_valid_commission with SQL instead of the ORM
+        
+        Computing the flag through the ORM on install would load every
+        payment and its calculations; a single UPDATE does the same job.
+        """
+        cr = self.env.cr
+        if not column_exists(cr, 'account_payment', 'has_valid_commission'):
+            create_column(cr, 'account_payment', 'has_valid_commission', 'boolean')
+            if table_exists(cr, 'commission_calculation'):
+                cr.execute("""
+                    UPDATE account_payment p
+                       SET has_valid_commission = EXISTS (
+                            SELECT 1
+                              FROM commission_calculation c
+                             WHERE c.payment_id = p.id
+                               AND c.state != 'cancelled'
+                       )
+                """)
+        return super()._auto_init()
+
     @api.depends('commission_calculation_ids.commission_amount', 'commission_calculation_ids.state')
     def _compute_total_commission(self):
+        Currency = self.env['res.currency']
         for payment in self:
             valid_calculations = payment.commission_calculation_ids.filtered(
                 lambda c: c.state not in ['cancelled']
@@ -67,8 +113,9 @@ class AccountPayment(models.Model):
             
             # Convert and sum commissions in other currencies
             for calc in valid_calculations.filtered(lambda c: c.currency_id != payment.currency_id):
-                amount_converted = calc.currency_id._convert(
+                amount_converted = Currency._commission_convert(
                     calc.commission_amount,
+                    calc.currency_id,
                     payment.currency_id,
                     payment.company_id,
                     payment.date
@@ -77,7 +124,8 @@ class AccountPayment(models.Model):
             
             payment.total_commission_amount = total
 
-    @api.depends('payment_type', 'partner_type', 'is_reconciled', 'skip_commission_calculation', 'state')
+    @api.depends('payment_type', 'partner_type', 'is_reconciled', 'skip_commission_calculation', 'state',
+                 'has_valid_commission')
     def _compute_can_calculate_commission(self):
         """Compute if commission can be calculated for this payment"""
         for payment in self:
@@ -89,25 +137,43 @@ class AccountPayment(models.Model):
                 payment.state == 'posted'
             )
             
-            # Check if there are already calculations
-            if can_calculate and payment.commission_calculation_ids:
-                # Only allow if all existing are cancelled
-                can_calculate = all(calc.state == 'cancelled' for calc in payment.commission_calculation_ids)
-            
-            payment.can_calculate_commission = can_calculate
+            # Only allow if there is no valid (non-cancelled) calculation
+            payment.can_calculate_commission = can_calculate and not payment.has_valid_commission
 
     def action_post(self):
         """Override to trigger commission calculation after payment is posted"""
         res = super().action_post()
         
-        # Trigger commission calculation for each payment
-        for payment in self:
-            if payment.payment_type == 'inbound' and not payment.skip_commission_calculation:
-                # Try to calculate immediately if already reconciled
-                payment._trigger_commission_calculation()
+        # Queue commission calculation, done once per payment after commit
+        self.filtered(
+            lambda p: p.payment_type == 'inbound' and not p.skip_commission_calculation
+        )._mark_commission_dirty()
         
         return res
 
+    def _mark_commission_dirty(self):
+        """Record the payments whose commissions must be calculated
+        
+        Ids are collected for the whole transaction and written to the
+        commission queue with a single statement right before commit, so a
+        payment reconciled many times in one transaction is queued once and
+        the reconciliation itself does not run any commission logic.
+        """
+        if not self:
+            return
+        
+        data = self.env.cr.precommit.data
+        dirty_ids = data.get(DIRTY_COMMISSION_PAYMENTS_KEY)
+        if dirty_ids is None:
+            dirty_ids = data[DIRTY_COMMISSION_PAYMENTS_KEY] = set()
+            self.env.cr.precommit.add(self._flush_commission_dirty)
+        dirty_ids.update(self.ids)
+
+    @api.model
+    def _flush_commission_dirty(self):
+        dirty_ids = self.env.cr.precommit.data.pop(DIRTY_COMMISSION_PAYMENTS_KEY, set())
+        self.env['commission.payment.queue']._enqueue_payment_ids(dirty_ids)
+
     def _trigger_commission_calculation(self):
         """Trigger commission calculation when payment is reconciled"""
         self.ensure_one()
@@ -160,15 +226,35 @@ class AccountPayment(models.Model):
         else:
             _logger.warning("No commission calculations were created for payment %s", self.name)
 
+    def _calculate_commissions(self):
+        """Calculate commissions for all eligible payments of the recordset in bulk
+        
+        Payments that already have a valid (non-cancelled) calculation are
+        skipped, the rest is handed over to the bulk calculation engine.
+        
+        Returns:
+            commission.calculation recordset with the created calculations
+        """
+        Calculation = self.env['commission.calculation']
+        payments = self.filtered(
+            lambda p: p.payment_type == 'inbound' and
+            p.partner_type == 'customer' and
+            p.is_reconciled and
+            not p.skip_commission_calculation and
+            not p.has_valid_commission
+        )
+        if not payments:
+            return Calculation
+        
+        return Calculation._calculate_commissions_from_payments(payments)
+
     def _reconcile_create_hook(self, counterpart_aml, payment_aml):
         """Hook called when payment is reconciled"""
         res = super()._reconcile_create_hook(counterpart_aml, payment_aml)
         
-        _logger.info("Payment %s reconciled. Triggering commission calculation.", self.name)
-        
-        # Trigger commission calculation after reconciliation
+        # Queue commission calculation after reconciliation
         if not self.skip_commission_calculation:
-            self._trigger_commission_calculation()
+            self._mark_commission_dirty()
         
         return res
 
@@ -221,63 +307,205 @@ class AccountPayment(models.Model):
         }
 
     def action_recalculate_commissions(self):
-        """Action to recalculate commissions for this payment"""
-        self.ensure_one()
+        """Action to recalculate commissions for the selected payments
         
-        # Cancel existing calculations
-        existing_calculations = self.commission_calculation_ids.filtered(
-            lambda c: c.state not in ['paid', 'cancelled']
-        )
+        A single payment is recalculated right away; several payments are
+        recalculated by a background job so the request does not hit the
+        worker time limit.
+        """
+        existing_calculations = self._get_recalculable_commissions()
         
         if not existing_calculations:
             raise UserError(_("No commissions to recalculate."))
         
-        existing_calculations.action_cancel()
-        
-        # Trigger recalculation
-        self._trigger_commission_calculation()
+        if len(self) == 1:
+            self._run_recalculate_commissions()
+            title = _('Commission Recalculation')
+            message = _('Commission has been recalculated for payment %s') % self.name
+        else:
+            payments = existing_calculations.payment_id
+            self.env['commission.job']._enqueue({
+                'name': _("Recalculate commissions for %d payments") % len(payments),
+                'job_type': 'payment_recalculate',
+                'payment_ids': [(6, 0, payments.ids)],
+            })
+            title = _('Commission Recalculation Queued')
+            message = _('Commissions of %d payments are being recalculated in the background.') % len(payments)
         
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
             'params': {
-                'title': _('Commission Recalculation'),
-                'message': _('Commission has been recalculated for payment %s') % self.name,
+                'title': title,
+                'message': message,
                 'type': 'success',
                 'sticky': False,
             }
         }
 
+    def _get_recalculable_commissions(self):
+        """Calculations of the recordset that can still be recalculated"""
+        return self.commission_calculation_ids.filtered(
+            lambda c: c.state not in ['paid', 'cancelled']
+        )
+
+    def _run_recalculate_commissions(self, job=None, chunk_size=None):
+        """Cancel and recalculate the commissions of the recordset chunk by chunk
+        
+        Args:
+            job: commission.job whose progress is updated after each chunk (optional)
+            chunk_size: Number of payments per chunk (optional)
+            
+        Returns:
+            int: Number of commission calculations created
+        """
+        chunk_size = chunk_size or int(
+            self.env['ir.config_parameter'].sudo().get_param('commission_band.pending_commission_chunk_size', 500)
+        )
+        total = len(self)
+        created = 0
+        
+        for start in range(0, total, chunk_size):
+            payments = self[start:start + chunk_size]
+            
+            # Cancel existing calculations
+            payments._get_recalculable_commissions().action_cancel()
+            
+            # Trigger recalculation in bulk
+            created += len(payments._calculate_commissions())
+            
+            if job:
+                job._set_progress(min(start + chunk_size, total), total)
+        
+        return created
+
+    @api.model
+    def _cron_calculate_pending_commissions(self, chunk_size=None):
+        """Cron job to calculate commissions for reconciled payments without calculations
+        
+        Each call processes one chunk of payments ordered by id and reports
+        its progress with ir.cron._notify_progress, so the cron runner
+        commits the chunk and calls again while payments remain. The last
+        processed id is kept in commission.sweep.state: payments that cannot
+        get a commission (no salesperson, no applicable rule...) are passed
+        over instead of being selected again by every call. Once the sweep
+        reaches the last payment the position is reset, so payments
+        reconciled later are picked up by the next sweep.
+        
+        Args:
+            chunk_size: Number of payments per chunk (optional)
+        """
+        chunk_size = chunk_size or int(
+            self.env['ir.config_parameter'].sudo().get_param('commission_band.pending_commission_chunk_size', 500)
+        )
+        SweepState = self.env['commission.sweep.state']
+        last_payment_id = SweepState._get_last_id(PENDING_COMMISSION_SWEEP_KEY)
+        
+        # Find reconciled customer payments without valid commission calculations
+        pending_payments = self.browse(self._get_pending_commission_payment_ids(
+            after_id=last_payment_id, limit=chunk_size
+        ))
+        
+        if not pending_payments:
+            # Sweep completed, start over on the next run
+            SweepState._set_last_id(PENDING_COMMISSION_SWEEP_KEY, 0)
+            self.env['ir.cron']._notify_progress(done=0, remaining=0)
+            _logger.info("Pending commission sweep completed")
+            return True
+        
+        _logger.info("Found %d payments pending commission calculation in chunk after payment id %d",
+                     len(pending_payments), last_payment_id)
+        
+        self._calculate_pending_commissions(pending_payments)
+        
+        last_payment_id = pending_payments[-1].id
+        SweepState._set_last_id(PENDING_COMMISSION_SWEEP_KEY, last_payment_id)
+        self.env['ir.cron']._notify_progress(
+            done=len(pending_payments),
+            remaining=self._count_pending_commission_payments(after_id=last_payment_id),
+        )
+        return True
+
     @api.model
-    def _cron_calculate_pending_commissions(self):
-        """Cron job to calculate commissions for reconciled payments without calculations"""
-        # Find reconciled customer payments without commission calculations
+    def _get_pending_commission_query(self, after_id=0):
+        """Query of reconciled customer payments without valid commission calculations
+        
+        The selection is a NOT EXISTS anti-join against commission_calculation,
+        so no payment or calculation is loaded in the ORM cache.
+        
+        Args:
+            after_id: Only select payments with a greater id (optional)
+            
+        Returns:
+            Query
+        """
+        self.env['commission.calculation'].flush_model(['payment_id', 'state'])
+        
         domain = [
             ('payment_type', '=', 'inbound'),
             ('partner_type', '=', 'customer'),
             ('is_reconciled', '=', True),
             ('skip_commission_calculation', '=', False),
             ('state', '=', 'posted'),
+            ('id', '>', after_id),
         ]
+        query = self._search(domain)
+        query.add_where(SQL(
+            """NOT EXISTS (
+                SELECT 1
+                  FROM commission_calculation c
+                 WHERE c.payment_id = %s
+                   AND c.state != 'cancelled'
+            )""",
+            SQL.identifier(query.table, 'id'),
+        ))
+        return query
+
+    @api.model
+    def _get_pending_commission_payment_ids(self, after_id=0, limit=None):
+        """Return ids of reconciled customer payments without valid commission calculations
         
-        payments = self.search(domain)
-        
-        # Filter payments without valid commission calculations
-        pending_payments = payments.filtered(
-            lambda p: not p.commission_calculation_ids or 
-            all(c.state == 'cancelled' for c in p.commission_calculation_ids)
-        )
-        
-        _logger.info("Found %d payments pending commission calculation", len(pending_payments))
-        
-        for payment in pending_payments:
+        Args:
+            after_id: Only return payments with a greater id (optional)
+            limit: Maximum number of ids to return (optional)
+            
+        Returns:
+            list: Payment ids ordered by id
+        """
+        query = self._get_pending_commission_query(after_id)
+        query.order = SQL.identifier(query.table, 'id')
+        query.limit = limit
+        return [row[0] for row in self.env.execute_query(query.select())]
+
+    @api.model
+    def _count_pending_commission_payments(self, after_id=0):
+        """Number of payments _get_pending_commission_payment_ids would return"""
+        query = self._get_pending_commission_query(after_id)
+        return self.env.execute_query(query.select(SQL("COUNT(*)")))[0][0]
+
+    @api.model
+    def _calculate_pending_commissions(self, payments):
+        """Calculate commissions for payments in bulk, isolating failures
+        
+        The whole recordset is processed by the bulk engine inside a
+        savepoint. If that fails, payments are retried one by one so a single
+        faulty payment does not block the rest.
+        """
+        try:
+            with self.env.cr.savepoint():
+                return payments._calculate_commissions()
+        except Exception as e:
+            _logger.warning("Bulk commission calculation failed, retrying payment by payment: %s", str(e))
+        
+        calculations = self.env['commission.calculation']
+        for payment in payments:
             try:
-                payment._trigger_commission_calculation()
+                with self.env.cr.savepoint():
+                    calculations |= payment._calculate_commissions()
             except Exception as e:
                 _logger.error("Error calculating commission for payment %s: %s", payment.name, str(e))
                 continue
-        
-        return True
+        return calculations
 
     def write(self, vals):
         """Override to handle skip_commission_calculation changes"""
@@ -285,9 +513,7 @@ class AccountPayment(models.Model):
         
         # If skip_commission_calculation is turned off, trigger calculation
         if 'skip_commission_calculation' in vals and not vals['skip_commission_calculation']:
-            for payment in self.filtered(lambda p: p.is_reconciled and p.payment_type == 'inbound'):
-                if not payment.commission_calculation_ids.filtered(lambda c: c.state != 'cancelled'):
-                    payment._trigger_commission_calculation()
+            self._calculate_commissions()
         
         return res
 
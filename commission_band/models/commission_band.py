@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+import bisect
+
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError
 
 
@@ -192,29 +194,81 @@ class CommissionBand(models.Model):
             tuple: (commission_rate, indicator_rate, range_id)
         """
         self.ensure_one()
+        return self.get_commission_rates([(days_overdue, payment_amount, currency_id)])[0]
+
+    def get_commission_rates(self, items):
+        """Get the commission rates for many payments at once
+        
+        Args:
+            items: Iterable of (days_overdue, payment_amount, currency_id) tuples
+        
+        Returns:
+            list: One (commission_rate, indicator_rate, range_id) tuple per item
+        """
+        self.ensure_one()
+        table = self._get_range_table(self.id, self.write_date)
+        return [
+            self._lookup_range_table(table, days_overdue, payment_amount, currency_id)
+            for days_overdue, payment_amount, currency_id in items
+        ]
+
+    @tools.ormcache('band_id', 'write_date')
+    def _get_range_table(self, band_id, write_date):
+        """Build the sorted interval table of a band
+        
+        Ranges are sorted by day_from so the range containing a number of
+        days is found by bisection. Keyed by the band write_date, and
+        invalidated whenever a range is created, written or unlinked.
+        
+        Returns:
+            dict: 'currency_id' (band currency restriction or None), 'starts'
+                  (sorted day_from values) and 'ranges' (one tuple per range:
+                  day_from, day_to, min_payment_amount, apply_only_currency_id,
+                  commission_rate, indicator_rate, range_id)
+        """
+        band = self.sudo().browse(band_id)
+        ranges = band.range_ids.sorted('day_from')
+        return {
+            'currency_id': band.currency_id.id if band.currency_specific and band.currency_id else None,
+            'starts': tuple(range_rec.day_from for range_rec in ranges),
+            'ranges': tuple(
+                (
+                    range_rec.day_from,
+                    range_rec.day_to,
+                    range_rec.min_payment_amount,
+                    range_rec.apply_only_currency_id.id,
+                    range_rec.commission_rate / 100.0,
+                    range_rec.indicator_rate / 100.0,
+                    range_rec.id,
+                )
+                for range_rec in ranges
+            ),
+        }
+
+    @api.model
+    def _lookup_range_table(self, table, days_overdue, payment_amount=0, currency_id=None):
+        """Resolve one (days_overdue, amount, currency) tuple against a range table"""
+        no_commission = (0.0, 0.0, False)
         
         # Check currency compatibility
-        if self.currency_specific and self.currency_id:
-            if not currency_id or currency_id != self.currency_id.id:
-                return (0.0, 0.0, False)
+        if table['currency_id'] and currency_id != table['currency_id']:
+            return no_commission
         
-        # Find applicable range
-        applicable_range = self.range_ids.filtered(
-            lambda r: r.day_from <= days_overdue <= r.day_to and
-            (not r.min_payment_amount or payment_amount >= r.min_payment_amount) and
-            (not r.apply_only_currency_id or r.apply_only_currency_id.id == currency_id)
-        )
+        # Ranges cannot overlap, so only the last range starting on or
+        # before days_overdue can contain it
+        position = bisect.bisect_right(table['starts'], days_overdue) - 1
+        if position < 0:
+            return no_commission
         
-        if applicable_range:
-            # Get the first range (should be only one due to overlap validation)
-            range_rec = applicable_range[0]
-            return (
-                range_rec.commission_rate / 100.0,
-                range_rec.indicator_rate / 100.0,
-                range_rec.id
-            )
+        day_from, day_to, min_amount, only_currency_id, rate, indicator_rate, range_id = table['ranges'][position]
+        if days_overdue > day_to:
+            return no_commission
+        if min_amount and payment_amount < min_amount:
+            return no_commission
+        if only_currency_id and only_currency_id != currency_id:
+            return no_commission
         
-        return (0.0, 0.0, False)
+        return (rate, indicator_rate, range_id)
 
     def copy(self, default=None):
         default = dict(default or {})
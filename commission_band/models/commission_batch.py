@@ -2,6 +2,7 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import SQL
 from dateutil.relativedelta import relativedelta
 import logging
 
@@ -65,27 +66,28 @@ class CommissionBatch(models.Model):
     )
     
     # Statistics
+    # Counters and totals are maintained incrementally by commission.calculation
     calculation_count = fields.Integer(
         string='Number of Calculations',
-        compute='_compute_statistics',
-        store=True
+        readonly=True,
+        copy=False
     )
     salesperson_count = fields.Integer(
         string='Number of Salespersons',
-        compute='_compute_statistics',
+        compute='_compute_salesperson_count',
         store=True
     )
     total_commission_usd = fields.Monetary(
         string='Total Commission (USD)',
-        compute='_compute_statistics',
-        store=True,
+        readonly=True,
+        copy=False,
         currency_field='currency_usd_id',
         help="Total commission amount in USD"
     )
     total_commission_ves = fields.Monetary(
         string='Total Commission (VES)',
-        compute='_compute_statistics',
-        store=True,
+        readonly=True,
+        copy=False,
         currency_field='currency_ves_id',
         help="Total commission amount in VES"
     )
@@ -128,51 +130,152 @@ class CommissionBatch(models.Model):
         tracking=True
     )
     
+    # Background jobs
+    job_ids = fields.One2many(
+        'commission.job',
+        'batch_id',
+        string='Background Jobs',
+        readonly=True
+    )
+    active_job_id = fields.Many2one(
+        'commission.job',
+        string='Running Job',
+        compute='_compute_active_job'
+    )
+    active_job_progress = fields.Float(
+        string='Job Progress',
+        related='active_job_id.progress'
+    )
+    last_job_error = fields.Text(
+        string='Last Job Error',
+        compute='_compute_active_job'
+    )
+    
     _sql_constraints = [
         ('date_check', 'CHECK (date_from <= date_to)', 
          'The start date must be before or equal to the end date!'),
     ]
 
+    @api.depends('job_ids.state')
+    def _compute_active_job(self):
+        for batch in self:
+            jobs = batch.job_ids.sorted('id', reverse=True)
+            batch.active_job_id = jobs.filtered(lambda j: j.state in ('pending', 'running'))[:1]
+            last_job = jobs[:1]
+            batch.last_job_error = last_job.error if last_job.state == 'failed' else False
+
     @api.depends('company_id')
     def _compute_currencies(self):
+        Currency = self.env['res.currency']
+        usd = Currency._get_commission_currency('USD')
+        ves = Currency._get_commission_currency('VES')
         for batch in self:
-            usd = self.env['res.currency'].search([('name', '=', 'USD')], limit=1)
-            ves = self.env['res.currency'].search([('name', '=', 'VES')], limit=1)
             batch.currency_usd_id = usd
             batch.currency_ves_id = ves
 
-    @api.depends('calculation_ids', 'calculation_ids.state', 'calculation_ids.commission_amount', 
-                 'calculation_ids.currency_id')
-    def _compute_statistics(self):
+    @api.depends('calculation_ids', 'calculation_ids.state', 'calculation_ids.salesperson_id')
+    def _compute_salesperson_count(self):
+        """Count distinct salespersons in the database
+        
+        A distinct count cannot be maintained with deltas, it is grouped
+        over the batch calculations instead.
+        """
+        batch_ids = [batch_id for batch_id in self.ids if batch_id]
+        counts = {}
+        if batch_ids:
+            counts = {
+                batch.id: salesperson_count
+                for batch, salesperson_count in self.env['commission.calculation']._read_group(
+                    [('batch_id', 'in', batch_ids), ('state', 'not in', ['cancelled'])],
+                    groupby=['batch_id'],
+                    aggregates=['salesperson_id:count_distinct'],
+                )
+            }
         for batch in self:
-            valid_calculations = batch.calculation_ids.filtered(
-                lambda c: c.state not in ['cancelled']
-            )
-            
-            batch.calculation_count = len(valid_calculations)
-            batch.salesperson_count = len(valid_calculations.mapped('salesperson_id'))
+            batch.salesperson_count = counts.get(batch.id, 0)
+
+    @api.model
+    def _get_calculation_totals(self, calculation_ids):
+        """Aggregate the contribution of calculations to their batch totals
+        
+        Amounts are grouped per batch, currency and payment date in a single
+        query. Currencies other than USD and VES are converted to USD once
+        per payment date instead of once per line.
+        
+        Args:
+            calculation_ids: commission.calculation ids
+        
+        Returns:
+            dict: {batch_id: [count, total_usd, total_ves]}
+        """
+        if not calculation_ids:
+            return {}
+        
+        Currency = self.env['res.currency']
+        totals = {}
+        for batch, currency, payment_date, amount, count in self.env['commission.calculation'].sudo()._read_group(
+            [('id', 'in', list(calculation_ids)), ('batch_id', '!=', False), ('state', 'not in', ['cancelled'])],
+            groupby=['batch_id', 'currency_id', 'payment_date:day'],
+            aggregates=['commission_amount:sum', '__count'],
+        ):
+            batch_totals = totals.setdefault(batch.id, [0, 0.0, 0.0])
+            batch_totals[0] += count
             
             # Calculate totals by currency
-            total_usd = 0.0
-            total_ves = 0.0
-            
-            for calc in valid_calculations:
-                if calc.currency_id.name == 'USD':
-                    total_usd += calc.commission_amount
-                elif calc.currency_id.name == 'VES':
-                    total_ves += calc.commission_amount
-                else:
-                    # Convert to USD for other currencies
-                    amount_usd = calc.currency_id._convert(
-                        calc.commission_amount,
-                        batch.currency_usd_id,
-                        batch.company_id,
-                        calc.payment_date or fields.Date.today()
-                    )
-                    total_usd += amount_usd
-            
-            batch.total_commission_usd = total_usd
-            batch.total_commission_ves = total_ves
+            if currency.name == 'USD':
+                batch_totals[1] += amount
+            elif currency.name == 'VES':
+                batch_totals[2] += amount
+            else:
+                # Convert to USD for other currencies
+                batch_totals[1] += Currency._commission_convert(
+                    amount,
+                    currency,
+                    batch.currency_usd_id,
+                    batch.company_id,
+                    payment_date or fields.Date.today()
+                )
+        return totals
+
+    @api.model
+    def _apply_totals_delta(self, added, removed=None):
+        """Add and subtract calculation contributions to the batch totals
+        
+        The stored counters are incremented in SQL, so adding one calculation
+        to a large batch does not aggregate the whole batch again and
+        concurrent updates of the same batch do not overwrite each other.
+        
+        Args:
+            added: Totals of _get_calculation_totals to add
+            removed: Totals of _get_calculation_totals to subtract (optional)
+        """
+        removed = removed or {}
+        deltas = {}
+        for batch_id in set(added) | set(removed):
+            new = added.get(batch_id, [0, 0.0, 0.0])
+            old = removed.get(batch_id, [0, 0.0, 0.0])
+            delta = [new_value - old_value for new_value, old_value in zip(new, old)]
+            if any(delta):
+                deltas[batch_id] = delta
+        if not deltas:
+            return
+        
+        fnames = ['calculation_count', 'total_commission_usd', 'total_commission_ves']
+        self.flush_model(fnames)
+        batch_ids = list(deltas)
+        self.env.execute_query(SQL(
+            """UPDATE commission_batch b
+                  SET calculation_count = COALESCE(b.calculation_count, 0) + d.count,
+                      total_commission_usd = COALESCE(b.total_commission_usd, 0) + d.total_usd,
+                      total_commission_ves = COALESCE(b.total_commission_ves, 0) + d.total_ves
+                 FROM unnest(%s::int[], %s::int[], %s::numeric[], %s::numeric[]) AS d(id, count, total_usd, total_ves)
+                WHERE b.id = d.id""",
+            batch_ids,
+            [deltas[batch_id][0] for batch_id in batch_ids],
+            [deltas[batch_id][1] for batch_id in batch_ids],
+            [deltas[batch_id][2] for batch_id in batch_ids],
+        ))
+        self.browse(batch_ids).invalidate_recordset(fnames)
 
     @api.constrains('date_from', 'date_to')
     def _check_dates(self):
@@ -205,22 +308,52 @@ class CommissionBatch(models.Model):
                 self.name = _("Commissions %s") % self.date_from.strftime('%B %Y')
 
     def action_calculate(self):
-        """Calculate commissions for this batch"""
+        """Queue the calculation of this batch as a background job"""
         self.ensure_one()
         
         if self.state != 'draft':
             raise UserError(_("Only draft batches can be calculated."))
         
-        # Find commission calculations in the period without batch
-        domain = [
+        if not self.env['commission.calculation'].search_count(self._get_calculation_domain(), limit=1):
+            raise UserError(_("No commission calculations found for the selected period."))
+        
+        self._enqueue_job('batch_calculate', _("Calculate batch %s") % self.name)
+        
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Batch Calculation Queued'),
+                'message': _('The batch is being calculated in the background. Progress is shown on the batch form.'),
+                'type': 'info',
+                'sticky': False,
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            }
+        }
+
+    def _get_calculation_domain(self):
+        """Domain of the commission calculations that belong to this batch period"""
+        self.ensure_one()
+        return [
             ('payment_date', '>=', self.date_from),
             ('payment_date', '<=', self.date_to),
             ('batch_id', '=', False),
             ('state', 'not in', ['cancelled']),
             ('company_id', '=', self.company_id.id)
         ]
+
+    def _run_calculate(self):
+        """Assign the period calculations to this batch (runs inside a commission job)
+        
+        Returns:
+            int: Number of calculations added to the batch
+        """
+        self.ensure_one()
+        
+        if self.state != 'draft':
+            raise UserError(_("Only draft batches can be calculated."))
         
-        calculations = self.env['commission.calculation'].search(domain)
+        calculations = self.env['commission.calculation'].search(self._get_calculation_domain())
         
         if not calculations:
             raise UserError(_("No commission calculations found for the selected period."))
@@ -234,16 +367,29 @@ class CommissionBatch(models.Model):
             body=_("Batch calculated with %d commission calculations.") % len(calculations)
         )
         
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': _('Batch Calculated'),
-                'message': _('%d commission calculations have been added to this batch.') % len(calculations),
-                'type': 'success',
-                'sticky': False,
-            }
-        }
+        return len(calculations)
+
+    def _enqueue_job(self, job_type, name):
+        """Queue a background job for this batch, refusing concurrent jobs
+        
+        Args:
+            job_type: commission.job job_type
+            name: Job description
+            
+        Returns:
+            commission.job record
+        """
+        self.ensure_one()
+        
+        if self.active_job_id:
+            raise UserError(_("A background job is already running for this batch: %s") % self.active_job_id.name)
+        
+        return self.env['commission.job']._enqueue({
+            'name': name,
+            'job_type': job_type,
+            'batch_id': self.id,
+            'company_id': self.company_id.id,
+        })
 
     def action_review(self):
         """Mark batch as reviewed by sales"""
@@ -266,7 +412,26 @@ class CommissionBatch(models.Model):
         )
 
     def action_generate_payment_document(self):
-        """Generate payment document for this batch"""
+        """Queue the generation of the payment document as a background job"""
+        self.ensure_one()
+        
+        self._check_can_generate_payment_document()
+        
+        self._enqueue_job('batch_payment_document', _("Generate payment document for %s") % self.name)
+        
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Payment Document Queued'),
+                'message': _('The payment document is being generated in the background. Progress is shown on the batch form.'),
+                'type': 'info',
+                'sticky': False,
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            }
+        }
+
+    def _check_can_generate_payment_document(self):
         self.ensure_one()
         
         if self.state != 'reviewed':
@@ -274,6 +439,16 @@ class CommissionBatch(models.Model):
         
         if not self.payment_date:
             raise UserError(_("Please set a payment date before generating the payment document."))
+
+    def _run_generate_payment_document(self):
+        """Generate the payment document of this batch (runs inside a commission job)
+        
+        Returns:
+            commission.payment.document record
+        """
+        self.ensure_one()
+        
+        self._check_can_generate_payment_document()
         
         # Create payment document
         payment_doc = self.env['commission.payment.document'].create({
@@ -290,14 +465,7 @@ class CommissionBatch(models.Model):
             'payment_document_id': payment_doc.id
         })
         
-        # Open the payment document
-        return {
-            'type': 'ir.actions.act_window',
-            'res_model': 'commission.payment.document',
-            'res_id': payment_doc.id,
-            'view_mode': 'form',
-            'target': 'current',
-        }
+        return payment_doc
 
     def action_mark_paid(self):
         """Mark batch as paid"""
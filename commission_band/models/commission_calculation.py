@@ -1,11 +1,48 @@
 # -*- coding: utf-8 -*-
 
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from psycopg2 import errors as pg_errors
+
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import SQL
+from odoo.tools.sql import index_exists
 import logging
+import threading
 
 _logger = logging.getLogger(__name__)
 
+# Composite and partial indexes matching the hot access paths:
+# (name, definition, unique)
+CALCULATION_INDEXES = [
+    # Existing valid calculations of a payment/invoice; also enforces one per pair
+    ('commission_calculation_payment_invoice_valid_uniq',
+     "(payment_id, invoice_id) WHERE state != 'cancelled'", True),
+    # Unbatched calculations of a period (batch calculation)
+    ('commission_calculation_unbatched_company_date_idx',
+     "(company_id, payment_date, state) WHERE batch_id IS NULL", False),
+    # Salesperson statistics and summary refresh
+    ('commission_calculation_salesperson_company_state_idx',
+     "(salesperson_id, company_id, state)", False),
+]
+
+# Fields whose changes affect commission.salesperson.summary
+SUMMARY_FIELDS = {
+    'salesperson_id', 'company_id', 'payment_id', 'invoice_id', 'state',
+    'commission_amount', 'currency_id', 'exchange_rate',
+}
+
+# Fields whose changes affect the commission.batch counters and totals
+BATCH_TOTAL_FIELDS = {'batch_id', 'state', 'commission_amount', 'currency_id', 'payment_id'}
+
+# Stored computed fields whose recomputation affects commission.salesperson.summary;
+# recomputations do not go through write()
+SUMMARY_COMPUTED_FIELDS = {
+    'payment_date', 'days_overdue', 'exchange_rate', 'commission_amount_company',
+}
+
 
 class CommissionCalculation(models.Model):
     _name = 'commission.calculation'
@@ -59,6 +96,14 @@ class CommissionCalculation(models.Model):
         index=True,
         help="Batch this calculation belongs to"
     )
+    payment_line_ids = fields.Many2many(
+        'commission.payment.line',
+        'commission_payment_line_calc_rel',
+        'calc_id',
+        'line_id',
+        string='Payment Document Lines',
+        readonly=True
+    )
     
     # Date fields
     invoice_date = fields.Date(
@@ -213,6 +258,87 @@ class CommissionCalculation(models.Model):
         help="Indicates if this calculation is included in a batch"
     )
 
+    def init(self):
+        """Create the composite and partial indexes of CALCULATION_INDEXES
+        
+        The unique index is skipped with an error while duplicate valid
+        calculations exist, so upgrading a database with duplicates does
+        not fail; it is created on the next update once they are cancelled.
+        """
+        cr = self.env.cr
+        for name, definition, unique in CALCULATION_INDEXES:
+            if index_exists(cr, name):
+                continue
+            duplicates = unique and self._get_duplicate_valid_calculations()
+            if duplicates:
+                _logger.error(
+                    "Unique index %s not created: %d payment/invoice pairs have several non-cancelled "
+                    "commission calculations (first pairs: %s). Duplicate calculations can be created "
+                    "until the extra ones are cancelled and the module is updated again.",
+                    name, len(duplicates), ', '.join('%s/%s' % tuple(pair) for pair in duplicates[:10]),
+                )
+                continue
+            cr.execute(SQL(
+                "CREATE %s INDEX %s ON commission_calculation %s",
+                SQL("UNIQUE") if unique else SQL(),
+                SQL.identifier(name),
+                SQL(definition),
+            ))
+
+    @api.model
+    def _get_duplicate_valid_calculations(self):
+        """Return (payment_id, invoice_id) pairs with several non-cancelled calculations"""
+        return self.env.execute_query(SQL("""
+            SELECT payment_id, invoice_id
+              FROM commission_calculation
+             WHERE state != 'cancelled'
+             GROUP BY payment_id, invoice_id
+            HAVING COUNT(*) > 1
+        """))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        calculations = super().create(vals_list)
+        self.env['commission.salesperson.summary']._mark_dirty(calculations)
+        Batch = self.env['commission.batch']
+        Batch._apply_totals_delta(Batch._get_calculation_totals(calculations.ids))
+        return calculations
+
+    def write(self, vals):
+        Summary = self.env['commission.salesperson.summary']
+        Batch = self.env['commission.batch']
+        if SUMMARY_FIELDS.intersection(vals):
+            # Old keys too, the calculation may move to another summary row
+            Summary._mark_dirty(self)
+        update_batch_totals = BATCH_TOTAL_FIELDS.intersection(vals)
+        if update_batch_totals:
+            old_totals = Batch._get_calculation_totals(self.ids)
+        res = super().write(vals)
+        if SUMMARY_FIELDS.intersection(vals):
+            Summary._mark_dirty(self)
+        if update_batch_totals:
+            Batch._apply_totals_delta(Batch._get_calculation_totals(self.ids), old_totals)
+        return res
+
+    def unlink(self):
+        self.env['commission.salesperson.summary']._mark_dirty(self)
+        Batch = self.env['commission.batch']
+        Batch._apply_totals_delta({}, Batch._get_calculation_totals(self.ids))
+        return super().unlink()
+
+    def _compute_field_value(self, field):
+        if field.name not in SUMMARY_COMPUTED_FIELDS:
+            return super()._compute_field_value(field)
+        
+        Summary = self.env['commission.salesperson.summary']
+        calculations = self.filtered('id')
+        if field.name == 'payment_date':
+            # A new payment date may move the calculations to another month
+            Summary._mark_dirty_stored(calculations.ids)
+        res = super()._compute_field_value(field)
+        Summary._mark_dirty(calculations)
+        return res
+
     @api.depends('salesperson_id', 'invoice_id', 'commission_amount', 'currency_id')
     def _compute_display_name(self):
         for calc in self:
@@ -255,9 +381,10 @@ class CommissionCalculation(models.Model):
 
     @api.depends('payment_date', 'currency_id', 'company_currency_id')
     def _compute_exchange_rate(self):
+        Currency = self.env['res.currency']
         for calc in self:
             if calc.currency_id and calc.company_currency_id and calc.payment_date:
-                calc.exchange_rate = calc.currency_id._get_conversion_rate(
+                calc.exchange_rate = Currency._get_commission_rate(
                     calc.currency_id,
                     calc.company_currency_id,
                     calc.company_id,
@@ -302,63 +429,153 @@ class CommissionCalculation(models.Model):
 
     def action_validate(self):
         """Validate commission calculation"""
+        to_validate, clamped_amounts, failures = self._prepare_validation()
+        if failures:
+            raise UserError(failures[0]['reason'])
+        self._apply_validation(to_validate, clamped_amounts)
+
+    def _prepare_validation(self):
+        """Check the calculations and compute the min/max clamps without writing
+        
+        Salesperson configurations of all involved salespersons are fetched
+        with a single search.
+        
+        Returns:
+            tuple: (calculations to validate,
+                    {clamped amount: calculations},
+                    [{'calculation_id', 'name', 'reason'}] of failures)
+        """
+        configs = self.env['salesperson.config'].search([
+            ('user_id', 'in', self.salesperson_id.ids),
+            ('company_id', 'in', self.company_id.ids)
+        ])
+        config_map = {(config.user_id.id, config.company_id.id): config for config in configs}
+        
+        to_validate_ids = []
+        clamped_ids = defaultdict(list)
+        failures = []
         for calc in self:
-            if calc.state != 'calculated':
-                raise UserError(_("Only calculated commissions can be validated."))
+            config = config_map.get((calc.salesperson_id.id, calc.company_id.id))
             
+            if calc.state != 'calculated':
+                reason = _("Only calculated commissions can be validated.")
             # If calculation is in a batch, check batch state
-            if calc.batch_id and calc.batch_id.state not in ['calculated', 'reviewed']:
-                raise UserError(_("Cannot validate commission in a batch that is not in 'Calculated' or 'Reviewed' state."))
-            
+            elif calc.batch_id and calc.batch_id.state not in ['calculated', 'reviewed']:
+                reason = _("Cannot validate commission in a batch that is not in 'Calculated' or 'Reviewed' state.")
             # Additional validation checks
-            if not calc.is_reconciled:
-                raise UserError(_("Cannot validate commission for unreconciled payment."))
-            
+            elif not calc.is_reconciled:
+                reason = _("Cannot validate commission for unreconciled payment.")
             # Check if salesperson configuration allows commission
-            config = self.env['salesperson.config'].search([
-                ('user_id', '=', calc.salesperson_id.id),
-                ('company_id', '=', calc.company_id.id)
-            ], limit=1)
+            elif config and not config.commission_active:
+                reason = _("Commission is not active for salesperson %s") % calc.salesperson_id.name
+            else:
+                reason = False
             
-            if config and not config.commission_active:
-                raise UserError(_("Commission is not active for salesperson %s") % calc.salesperson_id.name)
+            if reason:
+                failures.append({'calculation_id': calc.id, 'name': calc.display_name, 'reason': reason})
+                continue
+            
+            to_validate_ids.append(calc.id)
             
             # Apply min/max limits if configured
             if config:
-                if config.min_commission_amount and calc.commission_amount < config.min_commission_amount:
-                    calc.commission_amount = config.min_commission_amount
-                if config.max_commission_amount and calc.commission_amount > config.max_commission_amount:
-                    calc.commission_amount = config.max_commission_amount
+                amount = calc.commission_amount
+                if config.min_commission_amount and amount < config.min_commission_amount:
+                    amount = config.min_commission_amount
+                if config.max_commission_amount and amount > config.max_commission_amount:
+                    amount = config.max_commission_amount
+                if amount != calc.commission_amount:
+                    clamped_ids[amount].append(calc.id)
         
-        self.write({'state': 'validated'})
+        return (
+            self.browse(to_validate_ids),
+            {amount: self.browse(ids) for amount, ids in clamped_ids.items()},
+            failures,
+        )
+
+    @api.model
+    def _apply_validation(self, to_validate, clamped_amounts):
+        """Write the clamps, one statement per amount, and validate the calculations"""
+        for amount, calculations in clamped_amounts.items():
+            calculations._with_bulk_tracking().write({'commission_amount': amount})
+        to_validate._write_state('validated')
 
     def action_approve(self):
         """Approve commission for payment"""
         for calc in self:
             if calc.state != 'validated':
                 raise UserError(_("Only validated commissions can be approved."))
-        self.write({'state': 'approved'})
+        self._write_state('approved')
 
     def action_mark_paid(self):
         """Mark commission as paid"""
         for calc in self:
             if calc.state != 'approved':
                 raise UserError(_("Only approved commissions can be marked as paid."))
-        self.write({'state': 'paid'})
+        self._write_state('paid')
 
     def action_cancel(self):
         """Cancel commission calculation"""
         for calc in self:
             if calc.state == 'paid':
                 raise UserError(_("Cannot cancel paid commissions."))
-        self.write({'state': 'cancelled'})
+        self._write_state('cancelled')
 
     def action_reset_draft(self):
         """Reset to draft state"""
         for calc in self:
             if calc.state == 'paid':
                 raise UserError(_("Cannot reset paid commissions to draft."))
-        self.write({'state': 'draft'})
+        self._write_state('draft')
+
+    def _with_bulk_tracking(self):
+        """Return the recordset with mail tracking disabled when it holds several records
+        
+        A single calculation keeps its field tracking in the chatter; bulk
+        transitions are summarized on the batch by _write_state instead.
+        """
+        if len(self) > 1:
+            return self.with_context(tracking_disable=True)
+        return self
+
+    def _write_state(self, state):
+        """Move calculations to a new state
+        
+        Several calculations are written in one statement without per-record
+        tracking values, and one chatter message summarizing the transition
+        is posted on each affected batch.
+        
+        Args:
+            state: New calculation state
+        """
+        if len(self) <= 1:
+            return self.write({'state': state})
+        
+        # Number of calculations per batch and previous state
+        transitions = defaultdict(dict)
+        for batch, old_state, count in self._read_group(
+            [('id', 'in', self.ids)],
+            groupby=['batch_id', 'state'],
+            aggregates=['__count'],
+        ):
+            transitions[batch][old_state] = count
+        
+        res = self._with_bulk_tracking().write({'state': state})
+        
+        state_labels = dict(self._fields['state']._description_selection(self.env))
+        for batch, counts in transitions.items():
+            if not batch:
+                continue
+            batch.message_post(body=_(
+                "%(count)d commission calculations moved to %(state)s (%(details)s).",
+                count=sum(counts.values()),
+                state=state_labels[state],
+                details=', '.join(
+                    _("%(count)d from %(state)s", count=count, state=state_labels[old_state])
+                    for old_state, count in sorted(counts.items())
+                ),
+            ))
+        return res
 
     def action_remove_from_batch(self):
         """Remove calculation from batch"""
@@ -393,77 +610,317 @@ class CommissionCalculation(models.Model):
             _logger.info("Payment %s is not reconciled. Skipping commission calculation.", payment.name)
             return
         
-        # Process each reconciled invoice
-        for invoice in payment.reconciled_invoice_ids:
-            # Skip if no salesperson assigned
-            if not invoice.invoice_user_id:
-                _logger.info("Invoice %s has no salesperson. Skipping commission calculation.", invoice.name)
-                continue
-            
-            salesperson = invoice.invoice_user_id
-            
-            # Check if salesperson has commission active
-            config = self.env['salesperson.config'].search([
-                ('user_id', '=', salesperson.id),
-                ('company_id', '=', invoice.company_id.id)
-            ], limit=1)
-            
-            if config and not config.commission_active:
-                _logger.info("Commission not active for salesperson %s. Skipping.", salesperson.name)
-                continue
+        self._calculate_commissions_from_payments(payment)
+
+    @api.model
+    def _calculate_commissions_from_payments(self, payments):
+        """Calculate commissions for many payments at once
+        
+        Reconciled invoices, salesperson configurations and existing
+        calculations are prefetched with grouped queries, commissions are
+        computed per rule in one batched pass and all new calculations are
+        created with a single multi-create.
+        
+        Args:
+            payments: account.payment recordset
             
-            # Check if commission already calculated for this payment-invoice combination
-            existing = self.search([
-                ('payment_id', '=', payment.id),
-                ('invoice_id', '=', invoice.id),
+        Returns:
+            commission.calculation recordset with the created calculations
+        """
+        payments = payments.filtered('is_reconciled')
+        if not payments:
+            return self.browse()
+        
+        # Reconciled invoices are computed for the whole recordset at once
+        invoices = payments.mapped('reconciled_invoice_ids')
+        salespersons = invoices.mapped('invoice_user_id')
+        
+        # Salesperson configurations per (salesperson, company)
+        configs = self.env['salesperson.config'].search([
+            ('user_id', 'in', salespersons.ids),
+            ('company_id', 'in', invoices.mapped('company_id').ids)
+        ])
+        config_map = {(config.user_id.id, config.company_id.id): config for config in configs}
+        
+        # Payment-invoice combinations that already have a valid calculation
+        existing_pairs = {
+            (calc.payment_id.id, calc.invoice_id.id)
+            for calc in self.search([
+                ('payment_id', 'in', payments.ids),
                 ('state', '!=', 'cancelled')
-            ], limit=1)
-            
-            if existing:
-                _logger.info("Commission already calculated for payment %s and invoice %s.", 
-                           payment.name, invoice.name)
-                continue
-            
-            # Find applicable rule
-            applicable_rule = salesperson.get_applicable_commission_rule(invoice, payment)
-            
-            if not applicable_rule and config and config.default_rule_id:
-                applicable_rule = config.default_rule_id
-            
-            if not applicable_rule:
-                _logger.info("No applicable commission rule found for salesperson %s.", salesperson.name)
-                continue
+            ])
+        }
+        
+        # Applicable rule -> list of (payment, invoice, salesperson)
+        pending_lines = defaultdict(list)
+        for payment in payments:
+            for invoice in payment.reconciled_invoice_ids:
+                # Skip if no salesperson assigned
+                if not invoice.invoice_user_id:
+                    _logger.debug("Invoice %s has no salesperson. Skipping commission calculation.", invoice.name)
+                    continue
+                
+                if (payment.id, invoice.id) in existing_pairs:
+                    _logger.debug("Commission already calculated for payment %s and invoice %s.",
+                                  payment.name, invoice.name)
+                    continue
+                
+                salesperson = invoice.invoice_user_id
+                config = config_map.get((salesperson.id, invoice.company_id.id))
+                
+                # Check if salesperson has commission active
+                if config and not config.commission_active:
+                    _logger.debug("Commission not active for salesperson %s. Skipping.", salesperson.name)
+                    continue
+                
+                # Find applicable rule
+                applicable_rule = salesperson.get_applicable_commission_rule(invoice, payment)
+                
+                if not applicable_rule and config and config.default_rule_id:
+                    applicable_rule = config.default_rule_id
+                
+                if not applicable_rule:
+                    _logger.debug("No applicable commission rule found for salesperson %s.", salesperson.name)
+                    continue
+                
+                pending_lines[applicable_rule].append((payment, invoice, salesperson))
+                existing_pairs.add((payment.id, invoice.id))
+        
+        # Calculate commissions per rule in one batched pass
+        vals_list = []
+        for rule, lines in pending_lines.items():
+            vals_list.extend(rule.calculate_commission_bulk(
+                [payment.amount for payment, _invoice, _salesperson in lines],
+                [invoice.invoice_date_due for _payment, invoice, _salesperson in lines],
+                [payment.date for payment, _invoice, _salesperson in lines],
+                currency_ids=[payment.currency_id.id for payment, _invoice, _salesperson in lines],
+                invoice_dates=[invoice.invoice_date for _payment, invoice, _salesperson in lines],
+                base_vals_list=[
+                    {
+                        'payment_id': payment.id,
+                        'invoice_id': invoice.id,
+                        'salesperson_id': salesperson.id,
+                        'rule_id': rule.id,
+                        'currency_id': payment.currency_id.id,
+                        'state': 'calculated',
+                    }
+                    for payment, invoice, salesperson in lines
+                ],
+            ))
+        
+        calculations = self.create(vals_list) if vals_list else self.browse()
+        _logger.info("Created %d commission calculations for %d payments.", len(calculations), len(payments))
+        return calculations
+
+    @api.model
+    def recalculate_commissions(self, date_from, date_to, company_ids=None, salesperson_ids=None, workers=None,
+                                job=None):
+        """Recalculate the commissions of all payments collected in a period
+        
+        Affected payments are partitioned by (salesperson, company). Each
+        partition is recalculated in its own cursor and transaction, by
+        parallel workers, so a failing partition does not roll back the
+        others. Payments whose invoices belong to several salespersons or
+        companies would be shared by partitions; they are recalculated as a
+        last partition once the parallel partitions are done.
+        
+        Partitions only see committed data: the method is meant to run from
+        a commission.job, whose state is committed before it is dispatched.
+        
+        Args:
+            date_from: First payment date of the period
+            date_to: Last payment date of the period
+            company_ids: Restrict to these companies (optional, defaults to allowed companies)
+            salesperson_ids: Restrict to these salespersons (optional)
+            workers: Number of parallel workers (optional)
+            job: commission.job whose progress is updated after each partition (optional)
             
-            # Calculate commission
-            commission_data = applicable_rule.calculate_commission(payment, invoice, salesperson)
+        Returns:
+            dict: Merged result with partition, payment, cancelled and created
+                counts and the list of conflicts
+        """
+        workers = workers or int(
+            self.env['ir.config_parameter'].sudo().get_param('commission_band.recalculation_workers', 4)
+        )
+        partitions, shared_payment_ids = self._get_recalculation_partitions(
+            date_from, date_to,
+            company_ids=company_ids or self.env.companies.ids,
+            salesperson_ids=salesperson_ids,
+        )
+        
+        result = {
+            'partitions': len(partitions) + (1 if shared_payment_ids else 0),
+            'payments': sum(len(ids) for ids in partitions.values()) + len(shared_payment_ids),
+            'cancelled': 0,
+            'created': 0,
+            'conflicts': [],
+        }
+        
+        # Tests share a single cursor, partitions are run in it one by one
+        testing = getattr(threading.current_thread(), 'testing', False)
+        run_partition = self._recalculate_partition if testing else self._recalculate_partition_in_worker
+        
+        outcomes = []
+        
+        def _collect(outcome):
+            outcomes.append(outcome)
+            if job:
+                job._set_progress(len(outcomes), result['partitions'])
+        
+        partition_items = sorted(partitions.items(), key=lambda item: -len(item[1]))
+        if workers > 1 and len(partition_items) > 1 and not testing:
+            with ThreadPoolExecutor(max_workers=min(workers, len(partition_items))) as executor:
+                futures = [
+                    executor.submit(run_partition, key, payment_ids)
+                    for key, payment_ids in partition_items
+                ]
+                for future in as_completed(futures):
+                    _collect(future.result())
+        else:
+            for key, payment_ids in partition_items:
+                _collect(run_partition(key, payment_ids))
+        
+        if shared_payment_ids:
+            _collect(run_partition(None, shared_payment_ids))
+        
+        if not testing:
+            self.env.invalidate_all()
+        
+        for outcome in outcomes:
+            result['cancelled'] += outcome['cancelled']
+            result['created'] += outcome['created']
+            if outcome.get('conflict'):
+                result['conflicts'].append(outcome['conflict'])
+        
+        _logger.info("Recalculated commissions for %d payments in %d partitions: %d cancelled, %d created, %d conflicts",
+                     result['payments'], result['partitions'], result['cancelled'], result['created'],
+                     len(result['conflicts']))
+        return result
+
+    @api.model
+    def _get_recalculation_partitions(self, date_from, date_to, company_ids, salesperson_ids=None):
+        """Group the payments of a period by the (salesperson, company) of their invoices
+        
+        Returns:
+            tuple: ({(salesperson_id, company_id): [payment ids]}, [shared payment ids])
+        """
+        payments = self.env['account.payment'].search([
+            ('payment_type', '=', 'inbound'),
+            ('partner_type', '=', 'customer'),
+            ('state', '=', 'posted'),
+            ('is_reconciled', '=', True),
+            ('skip_commission_calculation', '=', False),
+            ('date', '>=', date_from),
+            ('date', '<=', date_to),
+            ('company_id', 'in', company_ids),
+        ], order='id')
+        
+        partitions = defaultdict(list)
+        shared_payment_ids = []
+        for payment in payments:
+            keys = {
+                (invoice.invoice_user_id.id, invoice.company_id.id)
+                for invoice in payment.reconciled_invoice_ids
+                if invoice.invoice_user_id
+            }
+            if salesperson_ids:
+                if not any(salesperson_id in salesperson_ids for salesperson_id, _company_id in keys):
+                    continue
+            if len(keys) == 1:
+                partitions[keys.pop()].append(payment.id)
+            elif keys:
+                shared_payment_ids.append(payment.id)
+        return partitions, shared_payment_ids
+
+    def _recalculate_partition_in_worker(self, key, payment_ids):
+        """Recalculate one partition in a dedicated cursor, committed on success
+        
+        Any error rolls back the partition only; it is logged and reported
+        as a failed partition so the other partitions still complete.
+        """
+        try:
+            with self.env.registry.cursor() as cr:
+                env = api.Environment(cr, self.env.uid, self.env.context)
+                return env['commission.calculation']._recalculate_partition(key, payment_ids)
+        except Exception as e:
+            _logger.exception("Commission recalculation failed for partition %s", key)
+            return {
+                'cancelled': 0,
+                'created': 0,
+                'conflict': self._get_partition_conflict(key, payment_ids, e),
+            }
+
+    @api.model
+    def _recalculate_partition(self, key, payment_ids):
+        """Cancel and recalculate the commissions of one partition of payments
+        
+        Calculations of the partition are locked with NOWAIT; when another
+        transaction holds them the partition is reported as a conflict instead
+        of waiting.
+        
+        Args:
+            key: (salesperson_id, company_id) of the partition, None for shared payments
+            payment_ids: Payment ids of the partition
             
-            if commission_data:
-                # Create commission calculation record
-                self.create({
-                    'payment_id': payment.id,
-                    'invoice_id': invoice.id,
-                    'salesperson_id': salesperson.id,
-                    'rule_id': applicable_rule.id,
-                    'currency_id': payment.currency_id.id,
-                    'state': 'calculated',
-                    **commission_data
-                })
-                _logger.info("Commission calculated for payment %s, invoice %s, salesperson %s.", 
-                           payment.name, invoice.name, salesperson.name)
+        Returns:
+            dict: cancelled and created counts, and the conflict if any
+        """
+        outcome = {'cancelled': 0, 'created': 0, 'conflict': False}
+        try:
+            with self.env.cr.savepoint():
+                self.env.execute_query(SQL(
+                    "SELECT id FROM commission_calculation WHERE payment_id = ANY(%s) FOR UPDATE NOWAIT",
+                    payment_ids,
+                ))
+                payments = self.env['account.payment'].browse(payment_ids)
+                calculations = payments._get_recalculable_commissions()
+                calculations.action_cancel()
+                outcome['cancelled'] = len(calculations)
+                outcome['created'] = len(payments._calculate_commissions())
+        except (pg_errors.LockNotAvailable, pg_errors.SerializationFailure, pg_errors.UniqueViolation,
+                UserError) as e:
+            _logger.warning("Commission recalculation conflict for partition %s: %s", key, e)
+            outcome['conflict'] = self._get_partition_conflict(key, payment_ids, e)
+        return outcome
+
+    @api.model
+    def _get_partition_conflict(self, key, payment_ids, error):
+        """Describe a partition that could not be recalculated"""
+        return {
+            'salesperson_id': key[0] if key else False,
+            'company_id': key[1] if key else False,
+            'payment_ids': payment_ids,
+            'error': str(error),
+        }
 
     @api.model
     def cron_validate_commissions(self):
-        """Cron job to automatically validate calculated commissions"""
+        """Cron job to automatically validate calculated commissions
+        
+        Returns:
+            dict: Number of validated and clamped calculations and the list of failures
+        """
         calculations = self.search([
             ('state', '=', 'calculated'),
             ('is_reconciled', '=', True)
         ])
         
-        for calc in calculations:
-            try:
-                calc.action_validate()
-            except UserError as e:
-                _logger.warning("Could not validate commission %s: %s", calc.id, str(e))
+        to_validate, clamped_amounts, failures = calculations._prepare_validation()
+        calculations._apply_validation(to_validate, clamped_amounts)
+        
+        report = {
+            'validated': len(to_validate),
+            'clamped': sum(len(calcs) for calcs in clamped_amounts.values()),
+            'failures': failures,
+        }
+        _logger.info("Validated %d commissions (%d clamped), %d could not be validated",
+                     report['validated'], report['clamped'], len(failures))
+        if failures:
+            _logger.warning("Commissions not validated:\n%s", '\n'.join(
+                "%s (%s): %s" % (failure['name'], failure['calculation_id'], failure['reason'])
+                for failure in failures
+            ))
+        return report
 
     # Reporting methods
     def get_commission_summary(self):
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+import logging
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+
+class CommissionJob(models.Model):
+    _name = 'commission.job'
+    _description = 'Commission Background Job'
+    _order = 'id desc'
+
+    name = fields.Char(
+        string='Description',
+        required=True,
+        readonly=True
+    )
+    job_type = fields.Selection([
+        ('batch_calculate', 'Calculate Batch'),
+        ('batch_payment_document', 'Generate Payment Document'),
+        ('payment_recalculate', 'Recalculate Payment Commissions'),
+        ('period_recalculate', 'Recalculate Period Commissions'),
+    ], string='Job Type', required=True, readonly=True)
+
+    # State
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ], string='State', default='pending', required=True, readonly=True, index=True)
+    progress = fields.Float(
+        string='Progress (%)',
+        readonly=True,
+        help="Percentage of the job already processed"
+    )
+    error = fields.Text(
+        string='Error',
+        readonly=True
+    )
+    result = fields.Text(
+        string='Result',
+        readonly=True
+    )
+
+    # Job targets
+    batch_id = fields.Many2one(
+        'commission.batch',
+        string='Commission Batch',
+        ondelete='cascade',
+        readonly=True,
+        index=True
+    )
+    payment_ids = fields.Many2many(
+        'account.payment',
+        'commission_job_payment_rel',
+        'job_id',
+        'payment_id',
+        string='Payments',
+        readonly=True
+    )
+    date_from = fields.Date(
+        string='Date From',
+        readonly=True
+    )
+    date_to = fields.Date(
+        string='Date To',
+        readonly=True
+    )
+    salesperson_ids = fields.Many2many(
+        'res.users',
+        'commission_job_salesperson_rel',
+        'job_id',
+        'user_id',
+        string='Salespersons',
+        readonly=True
+    )
+    recalculate_company_ids = fields.Many2many(
+        'res.company',
+        'commission_job_company_rel',
+        'job_id',
+        'company_id',
+        string='Recalculated Companies',
+        readonly=True
+    )
+    workers = fields.Integer(
+        string='Parallel Workers',
+        readonly=True
+    )
+
+    # Execution context
+    user_id = fields.Many2one(
+        'res.users',
+        string='Requested By',
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.user
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        string='Company',
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.company
+    )
+    date_started = fields.Datetime(
+        string='Started',
+        readonly=True
+    )
+    date_finished = fields.Datetime(
+        string='Finished',
+        readonly=True
+    )
+
+    @api.model
+    def _enqueue(self, vals):
+        """Create a pending job and wake up the job runner
+
+        Args:
+            vals: Values for the new commission.job
+
+        Returns:
+            commission.job record
+        """
+        job = self.sudo().create(vals)
+        cron = self.env.ref('commission_band.ir_cron_run_commission_jobs', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+        return job
+
+    @api.model
+    def _cron_run_jobs(self, time_budget=None):
+        """Cron job running pending commission jobs in order
+
+        Args:
+            time_budget: Seconds to spend before re-triggering (optional)
+        """
+        time_budget = time_budget or int(
+            self.env['ir.config_parameter'].sudo().get_param('commission_band.job_time_budget', 240)
+        )
+        started = time.monotonic()
+
+        while True:
+            job = self.search([('state', '=', 'pending')], order='id', limit=1)
+            if not job:
+                return True
+
+            job._execute()
+
+            if time.monotonic() - started > time_budget:
+                if self.search_count([('state', '=', 'pending')]):
+                    self.env.ref('commission_band.ir_cron_run_commission_jobs')._trigger()
+                    self._commit_job()
+                return True
+
+    def _execute(self):
+        """Run the job, recording its outcome"""
+        self.ensure_one()
+
+        self.write({
+            'state': 'running',
+            'progress': 0.0,
+            'error': False,
+            'date_started': fields.Datetime.now(),
+        })
+        self._send_progress()
+        self._commit_job()
+
+        try:
+            result = self._dispatch()
+        except Exception as e:
+            _logger.exception("Commission job %s failed", self.name)
+            self._rollback_job()
+            self.write({
+                'state': 'failed',
+                'error': str(e),
+                'date_finished': fields.Datetime.now(),
+            })
+        else:
+            self.write({
+                'state': 'done',
+                'progress': 100.0,
+                'result': result or False,
+                'date_finished': fields.Datetime.now(),
+            })
+        self._send_progress()
+        self._commit_job()
+
+    def _dispatch(self):
+        """Call the operation of the job as the user who requested it
+
+        Returns:
+            str: Human readable result
+        """
+        self.ensure_one()
+        env_self = self.with_user(self.user_id).with_company(self.company_id)
+
+        if self.job_type == 'batch_calculate':
+            count = env_self.batch_id._run_calculate()
+            return _("%d commission calculations added to the batch.") % count
+
+        if self.job_type == 'batch_payment_document':
+            document = env_self.batch_id._run_generate_payment_document()
+            return _("Payment document %s generated.") % document.name
+
+        if self.job_type == 'payment_recalculate':
+            count = env_self.payment_ids._run_recalculate_commissions(job=self)
+            return _("%d commission calculations created.") % count
+
+        if self.job_type == 'period_recalculate':
+            result = env_self.env['commission.calculation'].recalculate_commissions(
+                self.date_from,
+                self.date_to,
+                company_ids=self.recalculate_company_ids.ids or None,
+                salesperson_ids=self.salesperson_ids.ids or None,
+                workers=self.workers or None,
+                job=self,
+            )
+            return self._format_recalculation_result(result)
+
+        raise UserError(_("Unknown commission job type: %s") % self.job_type)
+
+    def _format_recalculation_result(self, result):
+        """Human readable summary of a period recalculation
+
+        Args:
+            result: dict returned by commission.calculation.recalculate_commissions
+
+        Returns:
+            str: Counts followed by one line per conflicting partition
+        """
+        lines = [_("%(payments)d payments recalculated: %(cancelled)d calculations cancelled, "
+                   "%(created)d created.",
+                   payments=result['payments'], cancelled=result['cancelled'], created=result['created'])]
+        for conflict in result['conflicts']:
+            salesperson = self.env['res.users'].browse(conflict['salesperson_id'])
+            lines.append(_("%(salesperson)s: %(count)d payments - %(error)s",
+                           salesperson=salesperson.name or _("Several salespersons"),
+                           count=len(conflict['payment_ids']),
+                           error=conflict['error']))
+        return '\n'.join(lines)
+
+    def _set_progress(self, done, total):
+        """Record the progress of a running job and make it visible to users
+
+        Args:
+            done: Number of processed items
+            total: Total number of items
+        """
+        self.ensure_one()
+        self.sudo().progress = 100.0 * done / total if total else 100.0
+        self._send_progress()
+        self._commit_job()
+
+    def _send_progress(self):
+        """Push the job state to the user who requested it
+
+        Open views of the job or of its batch reload on the notification; a
+        finished or failed job is also announced with a toast. Bus messages
+        are sent when the job state is committed.
+        """
+        self.ensure_one()
+        self.user_id._bus_send('commission_band.job_progress', {
+            'job_id': self.id,
+            'batch_id': self.batch_id.id,
+            'state': self.state,
+            'progress': self.progress,
+        })
+
+        if self.state == 'done':
+            self.user_id._bus_send('simple_notification', {
+                'type': 'success',
+                'title': self.name,
+                'message': self.result or _("Job finished."),
+            })
+        elif self.state == 'failed':
+            self.user_id._bus_send('simple_notification', {
+                'type': 'danger',
+                'title': self.name,
+                'message': _("Job failed: %s") % self.error,
+                'sticky': True,
+            })
+
+    def _commit_job(self):
+        """Commit the current job state; nothing is committed while running tests"""
+        if getattr(threading.current_thread(), 'testing', False):
+            return
+        self.env.cr.commit()
+
+    def _rollback_job(self):
+        """Roll back the work of a failed job; nothing is rolled back while running tests"""
+        if getattr(threading.current_thread(), 'testing', False):
+            return
+        self.env.cr.rollback()
+        self.env.invalidate_all()
+
+    def action_retry(self):
+        """Put failed jobs back in the queue"""
+        for job in self:
+            if job.state != 'failed':
+                raise UserError(_("Only failed jobs can be retried."))
+        self.write({'state': 'pending', 'progress': 0.0, 'error': False})
+        cron = self.env.ref('commission_band.ir_cron_run_commission_jobs', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
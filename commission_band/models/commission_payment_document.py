@@ -2,10 +2,28 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
+import csv
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Columns of the per-calculation detail export: (row key, header)
+CALCULATION_DETAIL_COLUMNS = [
+    ('salesperson', 'Vendedor'),
+    ('customer', 'Cliente'),
+    ('invoice', 'Factura'),
+    ('payment', 'Pago'),
+    ('invoice_date', 'Fecha Factura'),
+    ('due_date', 'Fecha Vencimiento'),
+    ('payment_date', 'Fecha Pago'),
+    ('days_overdue', 'Días Vencidos'),
+    ('payment_amount', 'Monto Pago'),
+    ('currency', 'Moneda'),
+    ('commission_rate', '% Comisión'),
+    ('commission_amount', 'Monto Comisión'),
+    ('state', 'Estado'),
+]
+
 
 class CommissionPaymentDocument(models.Model):
     _name = 'commission.payment.document'
@@ -139,56 +157,53 @@ class CommissionPaymentDocument(models.Model):
             raise UserError(_("Payment lines already generated for this document."))
         
         # Get exchange rate for payment date
-        usd = self.env['res.currency'].search([('name', '=', 'USD')], limit=1)
-        ves = self.env['res.currency'].search([('name', '=', 'VES')], limit=1)
+        Currency = self.env['res.currency']
+        usd = Currency._get_commission_currency('USD')
+        ves = Currency._get_commission_currency('VES')
         
         if usd and ves:
-            self.exchange_rate_usd_ves = usd._get_conversion_rate(
+            self.exchange_rate_usd_ves = Currency._get_commission_rate(
                 usd, ves, self.company_id, self.payment_date
             )
         
-        # Group calculations by salesperson
-        salesperson_data = {}
+        # Group calculations by salesperson and currency in the database
+        Calculation = self.env['commission.calculation']
+        groups = Calculation._read_group(
+            [
+                ('batch_id', '=', self.batch_id.id),
+                ('state', 'in', ['calculated', 'validated', 'approved'])
+            ],
+            groupby=['salesperson_id', 'currency_id'],
+            aggregates=['commission_amount:sum', 'id:array_agg'],
+        )
         
-        for calc in self.batch_id.calculation_ids.filtered(
-            lambda c: c.state in ['calculated', 'validated', 'approved']
-        ):
-            sp_id = calc.salesperson_id.id
-            if sp_id not in salesperson_data:
-                salesperson_data[sp_id] = {
-                    'salesperson_id': sp_id,
-                    'calculations': self.env['commission.calculation'],
-                    'total_usd': 0.0,
-                    'total_ves': 0.0,
-                    'total_other': {}  # For other currencies
-                }
-            
-            salesperson_data[sp_id]['calculations'] |= calc
+        salesperson_data = {}
+        for salesperson, currency, amount, calculation_ids in groups:
+            data = salesperson_data.setdefault(salesperson.id, {
+                'calculation_ids': [],
+                'total_usd': 0.0,
+                'total_ves': 0.0,
+                'total_other': {}  # For other currencies
+            })
+            data['calculation_ids'].extend(calculation_ids)
             
             # Sum by currency
-            if calc.currency_id.name == 'USD':
-                salesperson_data[sp_id]['total_usd'] += calc.commission_amount
-            elif calc.currency_id.name == 'VES':
-                salesperson_data[sp_id]['total_ves'] += calc.commission_amount
+            if currency.name == 'USD':
+                data['total_usd'] += amount
+            elif currency.name == 'VES':
+                data['total_ves'] += amount
             else:
-                currency_name = calc.currency_id.name
-                if currency_name not in salesperson_data[sp_id]['total_other']:
-                    salesperson_data[sp_id]['total_other'][currency_name] = {
-                        'currency_id': calc.currency_id,
-                        'amount': 0.0
-                    }
-                salesperson_data[sp_id]['total_other'][currency_name]['amount'] += calc.commission_amount
+                data['total_other'][currency] = data['total_other'].get(currency, 0.0) + amount
         
         # Create payment lines
-        PaymentLine = self.env['commission.payment.line']
-        
+        vals_list = []
         for sp_id, data in salesperson_data.items():
             # Create main line for salesperson
             line_vals = {
                 'document_id': self.id,
                 'salesperson_id': sp_id,
-                'calculation_ids': [(6, 0, data['calculations'].ids)],
-                'commission_count': len(data['calculations']),
+                'calculation_ids': [(6, 0, data['calculation_ids'])],
+                'commission_count': len(data['calculation_ids']),
             }
             
             # Calculate payment amounts
@@ -201,26 +216,26 @@ class CommissionPaymentDocument(models.Model):
             line_vals['amount_ves_payment'] = data['total_ves']
             
             # Convert other currencies to payment currency (usually VES)
-            # This is where you'd implement the logic for other currencies
-            # For now, we'll convert them to VES
             total_other_in_ves = 0.0
-            for currency_data in data['total_other'].values():
-                amount_ves = currency_data['currency_id']._convert(
-                    currency_data['amount'],
+            for currency, amount in data['total_other'].items():
+                total_other_in_ves += Currency._commission_convert(
+                    amount,
+                    currency,
                     ves,
                     self.company_id,
                     self.payment_date
                 )
-                total_other_in_ves += amount_ves
             
             line_vals['amount_ves_payment'] += total_other_in_ves
-            
-            PaymentLine.create(line_vals)
+            vals_list.append(line_vals)
+        
+        self.env['commission.payment.line'].create(vals_list)
         
         # Update calculations state
-        self.batch_id.calculation_ids.filtered(
-            lambda c: c.state in ['calculated', 'validated']
-        ).write({'state': 'approved'})
+        Calculation.search([
+            ('batch_id', '=', self.batch_id.id),
+            ('state', 'in', ['calculated', 'validated'])
+        ])._write_state('approved')
 
     def action_confirm(self):
         """Confirm payment document"""
@@ -267,6 +282,295 @@ class CommissionPaymentDocument(models.Model):
         #     }
         # }
 
+    def _write_payment_workbook(self, workbook, include_detail=True):
+        """Write the payment document into an xlsxwriter workbook
+        
+        Rows are written strictly in order, sheet after sheet, so the
+        workbook can be opened in xlsxwriter's constant_memory mode.
+        
+        Args:
+            workbook: xlsxwriter.Workbook
+            include_detail: Add the per-calculation detail sheet
+        """
+        self.ensure_one()
+        document = self
+        
+        # Define formats
+        title_format = workbook.add_format({
+            'bold': True,
+            'font_size': 16,
+            'align': 'center',
+            'valign': 'vcenter',
+            'bg_color': '#003366',
+            'font_color': 'white'
+        })
+        
+        header_format = workbook.add_format({
+            'bold': True,
+            'font_size': 12,
+            'align': 'center',
+            'valign': 'vcenter',
+            'bg_color': '#4472C4',
+            'font_color': 'white',
+            'border': 1
+        })
+        
+        subheader_format = workbook.add_format({
+            'bold': True,
+            'font_size': 11,
+            'bg_color': '#D9E2F3',
+            'border': 1
+        })
+        
+        data_format = workbook.add_format({
+            'align': 'left',
+            'valign': 'vcenter',
+            'border': 1
+        })
+        
+        number_format = workbook.add_format({
+            'align': 'right',
+            'valign': 'vcenter',
+            'border': 1,
+            'num_format': '#,##0.00'
+        })
+        
+        date_format = workbook.add_format({
+            'align': 'center',
+            'valign': 'vcenter',
+            'border': 1,
+            'num_format': 'dd/mm/yyyy'
+        })
+        
+        total_format = workbook.add_format({
+            'bold': True,
+            'align': 'right',
+            'valign': 'vcenter',
+            'border': 1,
+            'num_format': '#,##0.00',
+            'bg_color': '#F2F2F2'
+        })
+        
+        # Create main sheet
+        sheet = workbook.add_worksheet('Payment Document')
+        
+        # Set column widths
+        sheet.set_column('A:A', 5)   # #
+        sheet.set_column('B:B', 40)  # Salesperson
+        sheet.set_column('C:C', 15)  # Commissions
+        sheet.set_column('D:E', 20)  # USD amounts
+        sheet.set_column('F:G', 20)  # VES amounts
+        sheet.set_column('H:H', 20)  # Total
+        
+        # Title
+        sheet.merge_range('A1:H1', f'DOCUMENTO DE PAGO DE COMISIONES - {document.name}', title_format)
+        sheet.set_row(0, 30)
+        
+        # Document info
+        row = 2
+        sheet.write(row, 1, 'Lote:', subheader_format)
+        sheet.write(row, 2, document.batch_id.name, data_format)
+        sheet.write(row, 4, 'Fecha de Pago:', subheader_format)
+        sheet.write(row, 5, document.payment_date, date_format)
+        row += 1
+        
+        sheet.write(row, 1, 'Período:', subheader_format)
+        sheet.write(row, 2, f"{document.batch_id.date_from.strftime('%d/%m/%Y')} - {document.batch_id.date_to.strftime('%d/%m/%Y')}", data_format)
+        sheet.write(row, 4, 'Tasa USD/VES:', subheader_format)
+        sheet.write(row, 5, document.exchange_rate_usd_ves or 1.0, number_format)
+        row += 2
+        
+        # Headers
+        headers = [
+            '#',
+            'Vendedor',
+            'Cant. Comisiones',
+            'USD Original',
+            'USD a Pagar',
+            'VES Original',
+            'VES a Pagar',
+            'Total a Pagar'
+        ]
+        
+        for col, header in enumerate(headers):
+            sheet.write(row, col, header, header_format)
+        row += 1
+        
+        # Data rows
+        line_number = 1
+        total_usd_original = 0
+        total_usd_payment = 0
+        total_ves_original = 0
+        total_ves_payment = 0
+        total_payment = 0
+        
+        for line in document.line_ids.sorted('salesperson_id'):
+            sheet.write(row, 0, line_number, data_format)
+            sheet.write(row, 1, line.salesperson_id.name, data_format)
+            sheet.write(row, 2, line.commission_count, data_format)
+            sheet.write(row, 3, line.amount_usd_original, number_format)
+            sheet.write(row, 4, line.amount_usd_payment, number_format)
+            sheet.write(row, 5, line.amount_ves_original, number_format)
+            sheet.write(row, 6, line.amount_ves_payment, number_format)
+            sheet.write(row, 7, line.total_payment, number_format)
+            
+            total_usd_original += line.amount_usd_original
+            total_usd_payment += line.amount_usd_payment
+            total_ves_original += line.amount_ves_original
+            total_ves_payment += line.amount_ves_payment
+            total_payment += line.total_payment
+            
+            line_number += 1
+            row += 1
+        
+        # Totals
+        sheet.write(row, 1, 'TOTALES:', total_format)
+        sheet.write(row, 2, document.total_lines, total_format)
+        sheet.write(row, 3, total_usd_original, total_format)
+        sheet.write(row, 4, total_usd_payment, total_format)
+        sheet.write(row, 5, total_ves_original, total_format)
+        sheet.write(row, 6, total_ves_payment, total_format)
+        sheet.write(row, 7, total_payment, total_format)
+        
+        if not include_detail:
+            return
+        
+        # Create detail sheet
+        detail_sheet = workbook.add_worksheet('Detalle por Vendedor')
+        
+        # Detail headers
+        detail_headers = [header for _key, header in CALCULATION_DETAIL_COLUMNS]
+        
+        # Set column widths for detail sheet
+        detail_sheet.set_column('A:A', 30)  # Salesperson
+        detail_sheet.set_column('B:B', 40)  # Customer
+        detail_sheet.set_column('C:D', 20)  # Invoice, Payment
+        detail_sheet.set_column('E:G', 15)  # Dates
+        detail_sheet.set_column('H:H', 12)  # Days
+        detail_sheet.set_column('I:I', 18)  # Amount
+        detail_sheet.set_column('J:J', 10)  # Currency
+        detail_sheet.set_column('K:K', 12)  # Rate
+        detail_sheet.set_column('L:L', 18)  # Commission
+        detail_sheet.set_column('M:M', 12)  # State
+        
+        # Title
+        detail_sheet.merge_range('A1:M1', 'DETALLE DE COMISIONES POR VENDEDOR', title_format)
+        detail_sheet.set_row(0, 30)
+        
+        # Headers
+        row = 2
+        for col, header in enumerate(detail_headers):
+            detail_sheet.write(row, col, header, header_format)
+        row += 1
+        
+        # Detail data grouped by salesperson (rows come sorted by salesperson)
+        date_columns = {'invoice_date', 'due_date', 'payment_date'}
+        number_columns = {'payment_amount', 'commission_amount'}
+        current_salesperson = None
+        subtotal = 0.0
+        
+        for detail in self._iter_calculation_detail_rows():
+            if detail['salesperson'] != current_salesperson:
+                if current_salesperson is not None:
+                    # Subtotal for previous salesperson
+                    detail_sheet.write(row, 10, f'Subtotal {current_salesperson}:', total_format)
+                    detail_sheet.write(row, 11, subtotal, total_format)
+                    row += 2
+                
+                # Salesperson header
+                current_salesperson = detail['salesperson']
+                subtotal = 0.0
+                detail_sheet.merge_range(row, 0, row, 12, current_salesperson, subheader_format)
+                row += 1
+            
+            # Commission details
+            for col, (key, _header) in enumerate(CALCULATION_DETAIL_COLUMNS):
+                value = detail[key]
+                if key in date_columns:
+                    detail_sheet.write(row, col, value or '', date_format)
+                elif key in number_columns:
+                    detail_sheet.write(row, col, value, number_format)
+                elif key == 'commission_rate':
+                    detail_sheet.write(row, col, f"{value}%", data_format)
+                else:
+                    detail_sheet.write(row, col, value, data_format)
+            subtotal += detail['commission_amount']
+            row += 1
+        
+        if current_salesperson is not None:
+            # Subtotal for last salesperson
+            detail_sheet.write(row, 10, f'Subtotal {current_salesperson}:', total_format)
+            detail_sheet.write(row, 11, subtotal, total_format)
+
+    def _iter_calculation_detail_rows(self, chunk_size=5000):
+        """Iterate over every calculation of the document as a flat row
+        
+        Calculations are sorted by salesperson and payment date with one
+        search, then read in chunks with a single read() per chunk, so
+        related names are resolved in bulk and memory stays bounded.
+        
+        Args:
+            chunk_size: Number of calculations read per query
+            
+        Yields:
+            dict: One row per calculation, keyed as CALCULATION_DETAIL_COLUMNS
+        """
+        self.ensure_one()
+        
+        Calculation = self.env['commission.calculation']
+        calculation_ids = Calculation.search(
+            [('payment_line_ids.document_id', '=', self.id)],
+            order='salesperson_id, payment_date, id'
+        ).ids
+        read_fields = [
+            'salesperson_id', 'partner_id', 'invoice_id', 'payment_id',
+            'invoice_date', 'due_date', 'payment_date', 'days_overdue',
+            'payment_amount', 'currency_id', 'commission_rate', 'commission_amount', 'state',
+        ]
+        
+        def name_of(value):
+            return value[1] if value else ''
+        
+        for start in range(0, len(calculation_ids), chunk_size):
+            chunk = Calculation.browse(calculation_ids[start:start + chunk_size])
+            for values in chunk.read(read_fields):
+                yield {
+                    'salesperson': name_of(values['salesperson_id']),
+                    'customer': name_of(values['partner_id']),
+                    'invoice': name_of(values['invoice_id']),
+                    'payment': name_of(values['payment_id']),
+                    'invoice_date': values['invoice_date'],
+                    'due_date': values['due_date'],
+                    'payment_date': values['payment_date'],
+                    'days_overdue': values['days_overdue'],
+                    'payment_amount': values['payment_amount'],
+                    'currency': name_of(values['currency_id']),
+                    'commission_rate': values['commission_rate'],
+                    'commission_amount': values['commission_amount'],
+                    'state': values['state'],
+                }
+            # Release the chunk from the cache before reading the next one
+            Calculation.invalidate_model()
+
+    def _write_calculation_detail_csv(self, output):
+        """Write one CSV row per calculation of the document
+        
+        Rows are written as they are read, so the export never holds more
+        than one chunk of calculations in memory.
+        
+        Args:
+            output: Text file object opened with newline=''
+        """
+        self.ensure_one()
+        
+        writer = csv.writer(output)
+        writer.writerow([header for _key, header in CALCULATION_DETAIL_COLUMNS])
+        for detail in self._iter_calculation_detail_rows():
+            writer.writerow([
+                detail[key] if detail[key] is not False else ''
+                for key, _header in CALCULATION_DETAIL_COLUMNS
+            ])
+
     def get_summary_by_currency(self):
         """Get payment summary by currency"""
         self.ensure_one()
@@ -363,6 +667,10 @@ class CommissionPaymentLine(models.Model):
     @api.depends('amount_usd_payment', 'amount_ves_payment')
     def _compute_total_payment(self):
         """Compute total payment in company currency"""
+        Currency = self.env['res.currency']
+        usd = Currency._get_commission_currency('USD')
+        ves = Currency._get_commission_currency('VES')
+        
         for line in self:
             # Get company currency
             company_currency = line.company_id.currency_id
@@ -371,10 +679,10 @@ class CommissionPaymentLine(models.Model):
             
             # Convert USD to company currency
             if line.amount_usd_payment > 0:
-                usd = self.env['res.currency'].search([('name', '=', 'USD')], limit=1)
                 if usd and usd != company_currency:
-                    total += usd._convert(
+                    total += Currency._commission_convert(
                         line.amount_usd_payment,
+                        usd,
                         company_currency,
                         line.company_id,
                         line.document_id.payment_date
@@ -384,10 +692,10 @@ class CommissionPaymentLine(models.Model):
             
             # Convert VES to company currency
             if line.amount_ves_payment > 0:
-                ves = self.env['res.currency'].search([('name', '=', 'VES')], limit=1)
                 if ves and ves != company_currency:
-                    total += ves._convert(
+                    total += Currency._commission_convert(
                         line.amount_ves_payment,
+                        ves,
                         company_currency,
                         line.company_id,
                         line.document_id.payment_date
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class CommissionPaymentQueue(models.Model):
+    _name = 'commission.payment.queue'
+    _description = 'Payments Pending Commission Calculation'
+    _order = 'id'
+
+    payment_id = fields.Many2one(
+        'account.payment',
+        string='Payment',
+        required=True,
+        ondelete='cascade'
+    )
+
+    _sql_constraints = [
+        ('payment_uniq', 'UNIQUE(payment_id)',
+         'A payment can only be queued once for commission calculation!'),
+    ]
+
+    @api.model
+    def _enqueue_payment_ids(self, payment_ids):
+        """Insert payment ids in the queue with a single statement and wake up the consumer
+        
+        Payments already in the queue are ignored, so a payment touched many
+        times is calculated only once.
+        
+        Args:
+            payment_ids: Iterable of account.payment ids
+        """
+        payment_ids = sorted(set(payment_ids))
+        if not payment_ids:
+            return
+        
+        self.env.execute_query(SQL(
+            """INSERT INTO commission_payment_queue (payment_id, create_uid, create_date, write_uid, write_date)
+               SELECT payment_id, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+                 FROM unnest(%(payment_ids)s) AS payment_id
+               ON CONFLICT (payment_id) DO NOTHING""",
+            uid=self.env.uid,
+            payment_ids=payment_ids,
+        ))
+        
+        cron = self.env.ref('commission_band.ir_cron_process_commission_queue', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+
+    @api.model
+    def _pop_payment_ids(self, limit):
+        """Remove and return the oldest queued payment ids
+        
+        Rows locked by another consumer are skipped.
+        
+        Args:
+            limit: Maximum number of ids to return
+            
+        Returns:
+            list: Payment ids
+        """
+        rows = self.env.execute_query(SQL(
+            """DELETE FROM commission_payment_queue
+                WHERE id IN (
+                    SELECT id
+                      FROM commission_payment_queue
+                     ORDER BY id
+                     LIMIT %s
+                       FOR UPDATE SKIP LOCKED
+                )
+            RETURNING payment_id""",
+            limit,
+        ))
+        return [row[0] for row in rows]
+
+    @api.model
+    def _cron_process_queue(self, chunk_size=None):
+        """Cron job calculating the commissions of queued payments in bulk
+        
+        Each call processes one chunk and reports its progress with
+        ir.cron._notify_progress; the cron runner commits the chunk and
+        calls again while payments remain queued.
+        
+        Args:
+            chunk_size: Number of payments per chunk (optional)
+        """
+        chunk_size = chunk_size or int(
+            self.env['ir.config_parameter'].sudo().get_param('commission_band.pending_commission_chunk_size', 500)
+        )
+        Payment = self.env['account.payment']
+        
+        payment_ids = self._pop_payment_ids(chunk_size)
+        payments = Payment.browse(payment_ids).exists()
+        if payments:
+            _logger.info("Calculating commissions for %d queued payments", len(payments))
+            Payment._calculate_pending_commissions(payments)
+        
+        self.env['ir.cron']._notify_progress(
+            done=len(payment_ids),
+            remaining=self.search_count([]),
+        )
+        return True
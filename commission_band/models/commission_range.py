@@ -81,6 +81,22 @@ class CommissionRange(models.Model):
         compute='_compute_color'
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        ranges = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return ranges
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
     @api.depends('day_from', 'day_to', 'name', 'commission_rate')
     def _compute_display_name(self):
         for range_rec in self:
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, tools
+from odoo.tools import SQL
+from odoo.tools.sql import table_kind, TableKind
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# System parameter switching commission_report to a materialized view
+MATERIALIZED_REPORT_PARAM = 'commission_band.report_materialized'
+
+
+class CommissionReport(models.Model):
+    _name = 'commission.report'
+    _description = 'Commission Analysis Report'
+    _auto = False
+    _rec_name = 'calculation_id'
+    _order = 'payment_date desc'
+
+    calculation_id = fields.Many2one('commission.calculation', string='Calculation', readonly=True)
+
+    # Dimensions
+    salesperson_id = fields.Many2one('res.users', string='Salesperson', readonly=True)
+    team_id = fields.Many2one('crm.team', string='Sales Team', readonly=True)
+    company_id = fields.Many2one('res.company', string='Company', readonly=True)
+    partner_id = fields.Many2one('res.partner', string='Customer', readonly=True)
+    commercial_partner_id = fields.Many2one('res.partner', string='Commercial Entity', readonly=True)
+    country_id = fields.Many2one('res.country', string='Customer Country', readonly=True)
+    invoice_id = fields.Many2one('account.move', string='Invoice', readonly=True)
+    payment_id = fields.Many2one('account.payment', string='Payment', readonly=True)
+    journal_id = fields.Many2one('account.journal', string='Payment Journal', readonly=True)
+    rule_id = fields.Many2one('commission.rule', string='Commission Rule', readonly=True)
+    band_id = fields.Many2one('commission.band', string='Commission Band', readonly=True)
+    range_id = fields.Many2one('commission.range', string='Commission Range', readonly=True)
+    batch_id = fields.Many2one('commission.batch', string='Commission Batch', readonly=True)
+    currency_id = fields.Many2one('res.currency', string='Currency', readonly=True)
+    company_currency_id = fields.Many2one('res.currency', string='Company Currency', readonly=True)
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('calculated', 'Calculated'),
+        ('validated', 'Validated'),
+        ('approved', 'Approved'),
+        ('paid', 'Paid'),
+        ('cancelled', 'Cancelled')
+    ], string='State', readonly=True)
+
+    # Dates
+    invoice_date = fields.Date(string='Invoice Date', readonly=True)
+    due_date = fields.Date(string='Due Date', readonly=True)
+    payment_date = fields.Date(string='Payment Date', readonly=True)
+
+    # Measures
+    days_overdue = fields.Integer(string='Days Overdue', readonly=True, aggregator='avg')
+    range_day_from = fields.Integer(string='Range From (days)', readonly=True, aggregator=None)
+    range_day_to = fields.Integer(string='Range To (days)', readonly=True, aggregator=None)
+    commission_rate = fields.Float(string='Commission Rate (%)', readonly=True, aggregator='avg')
+    payment_amount = fields.Monetary(string='Payment Amount', readonly=True, currency_field='currency_id')
+    payment_amount_company = fields.Monetary(string='Payment Amount (Company Currency)', readonly=True,
+                                             currency_field='company_currency_id')
+    commission_amount = fields.Monetary(string='Commission Amount', readonly=True, currency_field='currency_id')
+    commission_amount_company = fields.Monetary(string='Commission (Company Currency)', readonly=True,
+                                                currency_field='company_currency_id')
+
+    def _query(self):
+        return SQL("""
+            SELECT c.id AS id,
+                   c.id AS calculation_id,
+                   c.salesperson_id,
+                   inv.team_id,
+                   c.company_id,
+                   c.partner_id,
+                   partner.commercial_partner_id,
+                   partner.country_id,
+                   c.invoice_id,
+                   c.payment_id,
+                   c.journal_id,
+                   c.rule_id,
+                   c.band_id,
+                   c.range_id,
+                   c.batch_id,
+                   c.currency_id,
+                   c.company_currency_id,
+                   c.state,
+                   c.invoice_date,
+                   c.due_date,
+                   c.payment_date,
+                   c.days_overdue,
+                   rng.day_from AS range_day_from,
+                   rng.day_to AS range_day_to,
+                   c.commission_rate,
+                   c.payment_amount,
+                   c.payment_amount_company,
+                   c.commission_amount,
+                   c.commission_amount_company
+              FROM commission_calculation c
+         LEFT JOIN account_move inv ON inv.id = c.invoice_id
+         LEFT JOIN res_partner partner ON partner.id = c.partner_id
+         LEFT JOIN commission_range rng ON rng.id = c.range_id
+        """)
+
+    @api.model
+    def _is_materialized(self):
+        return tools.str2bool(
+            self.env['ir.config_parameter'].sudo().get_param(MATERIALIZED_REPORT_PARAM, 'False')
+        )
+
+    def init(self):
+        """Create the report relation, as a plain or a materialized view"""
+        cr = self.env.cr
+        tools.drop_view_if_exists(cr, self._table)
+        
+        if not self._is_materialized():
+            cr.execute(SQL("CREATE OR REPLACE VIEW %s AS (%s)", SQL.identifier(self._table), self._query()))
+            return
+        
+        cr.execute(SQL("CREATE MATERIALIZED VIEW %s AS (%s)", SQL.identifier(self._table), self._query()))
+        # Unique index required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+        cr.execute(SQL("CREATE UNIQUE INDEX commission_report_id_uniq ON %s (id)", SQL.identifier(self._table)))
+        cr.execute(SQL(
+            "CREATE INDEX commission_report_salesperson_date_idx ON %s (salesperson_id, payment_date)",
+            SQL.identifier(self._table),
+        ))
+        cr.execute(SQL(
+            "CREATE INDEX commission_report_company_state_date_idx ON %s (company_id, state, payment_date)",
+            SQL.identifier(self._table),
+        ))
+
+    @api.model
+    def _cron_refresh(self):
+        """Cron job refreshing the materialized report
+        
+        The relation is recreated when the system parameter no longer
+        matches its kind.
+        """
+        kind = table_kind(self.env.cr, self._table)
+        if self._is_materialized() != (kind == TableKind.Materialized):
+            _logger.info("Commission report mode changed, recreating %s", self._table)
+            self.init()
+            return True
+        
+        if kind == TableKind.Materialized:
+            self.env['commission.calculation'].flush_model()
+            self.env.cr.execute(SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY %s", SQL.identifier(self._table)))
+            _logger.info("Commission report refreshed")
+        return True
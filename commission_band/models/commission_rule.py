@@ -1,8 +1,19 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+from collections import defaultdict
+
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError
 
+# Criteria that are pre-bucketed in the compiled rule index:
+# (index dimension, many2many field on commission.rule)
+RULE_INDEX_DIMENSIONS = [
+    ('salesperson', 'salesperson_ids'),
+    ('team', 'team_ids'),
+    ('customer', 'customer_ids'),
+    ('journal', 'journal_ids'),
+]
+
 
 class CommissionRule(models.Model):
     _name = 'commission.rule'
@@ -197,6 +208,22 @@ class CommissionRule(models.Model):
             if rule.min_amount and rule.max_amount and rule.min_amount > rule.max_amount:
                 raise ValidationError(_("'Minimum Amount' must be less than or equal to 'Maximum Amount'"))
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        rules = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return rules
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
     def _compute_calculation_count(self):
         """Compute the number of calculations using this rule"""
         for rule in self:
@@ -292,6 +319,125 @@ class CommissionRule(models.Model):
         
         return True
 
+    @tools.ormcache('company_id')
+    def _get_rule_index(self, company_id):
+        """Compile the active rules of a company into an in-memory index
+
+        Rules are pre-bucketed by salesperson, team, customer and journal so
+        that candidate rules are found with set operations on ids. Only ids,
+        dates and amounts are kept, the index is shared by all users and is
+        invalidated whenever a rule is created, written or unlinked.
+
+        Args:
+            company_id: ID of the res.company
+
+        Returns:
+            dict: 'entries' (rule criteria in evaluation order), 'buckets'
+                  (rule ids per criterion value) and 'wildcards' (rule ids
+                  that do not restrict the criterion)
+        """
+        rules = self.sudo().search([
+            ('active', '=', True),
+            ('company_id', '=', company_id)
+        ], order='priority, sequence')
+
+        entries = []
+        buckets = {dimension: defaultdict(set) for dimension, _field in RULE_INDEX_DIMENSIONS}
+        wildcards = {dimension: set() for dimension, _field in RULE_INDEX_DIMENSIONS}
+
+        for rule in rules:
+            entries.append({
+                'id': rule.id,
+                'date_from': rule.date_from,
+                'date_to': rule.date_to,
+                'min_amount': rule.min_amount,
+                'max_amount': rule.max_amount,
+                'payment_term_ids': frozenset(rule.payment_term_ids.ids),
+                'product_ids': frozenset(rule.product_ids.ids),
+                'category_ids': frozenset(rule.category_ids.ids),
+            })
+            for dimension, field_name in RULE_INDEX_DIMENSIONS:
+                value_ids = rule[field_name].ids
+                if not value_ids:
+                    wildcards[dimension].add(rule.id)
+                for value_id in value_ids:
+                    buckets[dimension][value_id].add(rule.id)
+
+        return {
+            'entries': tuple(entries),
+            'buckets': {
+                dimension: {value_id: frozenset(rule_ids) for value_id, rule_ids in values.items()}
+                for dimension, values in buckets.items()
+            },
+            'wildcards': {dimension: frozenset(rule_ids) for dimension, rule_ids in wildcards.items()},
+        }
+
+    @api.model
+    def _find_matching_rule(self, company_id, invoice=None, payment=None, salesperson=None):
+        """Find the first active rule of a company matching the given criteria
+
+        Same semantics as evaluating matches_criteria on every rule in
+        priority order, but resolved against the compiled rule index.
+
+        Args:
+            company_id: ID of the res.company
+            invoice: account.move record (optional)
+            payment: account.payment record (optional)
+            salesperson: res.users record (optional)
+
+        Returns:
+            commission.rule record (empty if no rule matches)
+        """
+        index = self._get_rule_index(company_id)
+
+        # A criterion is only checked when the related record is available
+        keys = {
+            'salesperson': salesperson.id if salesperson else None,
+            'team': salesperson.sale_team_id.id if salesperson and salesperson.sale_team_id else None,
+            'customer': invoice.partner_id.id if invoice else None,
+            'journal': payment.journal_id.id if payment else None,
+        }
+
+        candidates = None
+        for dimension, key in keys.items():
+            if key is None:
+                continue
+            allowed = index['wildcards'][dimension] | index['buckets'][dimension].get(key, frozenset())
+            candidates = allowed if candidates is None else candidates & allowed
+            if not candidates:
+                return self.browse()
+
+        check_date = payment.date if payment else fields.Date.today()
+        amount = payment.amount if payment else 0
+        payment_term_id = invoice.invoice_payment_term_id.id if invoice else None
+        product_ids = category_ids = None
+
+        for entry in index['entries']:
+            if candidates is not None and entry['id'] not in candidates:
+                continue
+            if entry['date_from'] and check_date < entry['date_from']:
+                continue
+            if entry['date_to'] and check_date > entry['date_to']:
+                continue
+            if entry['min_amount'] and amount < entry['min_amount']:
+                continue
+            if entry['max_amount'] and amount > entry['max_amount']:
+                continue
+            if entry['payment_term_ids'] and invoice and payment_term_id not in entry['payment_term_ids']:
+                continue
+            if (entry['product_ids'] or entry['category_ids']) and invoice:
+                if product_ids is None:
+                    products = invoice.invoice_line_ids.mapped('product_id')
+                    product_ids = set(products.ids)
+                    category_ids = set(products.mapped('categ_id').ids)
+                if entry['product_ids'] and entry['product_ids'].isdisjoint(product_ids):
+                    continue
+                if entry['category_ids'] and entry['category_ids'].isdisjoint(category_ids):
+                    continue
+            return self.browse(entry['id'])
+
+        return self.browse()
+
     def calculate_commission(self, payment, invoice, salesperson):
         """Calculate commission based on rule configuration
         
@@ -305,52 +451,93 @@ class CommissionRule(models.Model):
         """
         self.ensure_one()
         
+        vals_list = self.calculate_commission_bulk(
+            [payment.amount],
+            [invoice.invoice_date_due],
+            [payment.date],
+            currency_ids=[payment.currency_id.id],
+            invoice_dates=[invoice.invoice_date],
+        )
+        return vals_list[0] if vals_list else None
+
+    def calculate_commission_bulk(self, payment_amounts, due_dates, payment_dates,
+                                  currency_ids=None, invoice_dates=None, base_vals_list=None):
+        """Calculate commissions for many lines sharing this rule in one pass
+        
+        Days overdue are computed for all lines first and band rates are then
+        resolved with a single call to the band interval table.
+        
+        Args:
+            payment_amounts: Sequence of payment amounts
+            due_dates: Sequence of invoice due dates
+            payment_dates: Sequence of payment dates
+            currency_ids: Sequence of payment currency ids (optional)
+            invoice_dates: Sequence of invoice dates (optional)
+            base_vals_list: Sequence of dicts merged into each result, e.g.
+                            payment_id, invoice_id, salesperson_id (optional)
+            
+        Returns:
+            list: Commission calculation vals, only for lines that produce a
+                  commission, ready for a multi-create
+        """
+        self.ensure_one()
+        
         if self.commission_type == 'none':
-            return None
+            return []
         
-        base_data = {
-            'payment_amount': payment.amount,
-            'invoice_date': invoice.invoice_date,
-            'due_date': invoice.invoice_date_due,
-            'payment_date': payment.date,
-        }
+        count = len(payment_amounts)
+        currency_ids = currency_ids or [None] * count
+        invoice_dates = invoice_dates or [False] * count
+        base_vals_list = base_vals_list or [{}] * count
         
-        if self.commission_type == 'fixed':
-            return {
-                **base_data,
-                'commission_rate': 0,
-                'commission_amount': self.fixed_amount,
+        base_data = [
+            {
+                **base_vals_list[i],
+                'payment_amount': payment_amounts[i],
+                'invoice_date': invoice_dates[i],
+                'due_date': due_dates[i],
+                'payment_date': payment_dates[i],
             }
+            for i in range(count)
+        ]
         
-        elif self.commission_type == 'percentage':
-            return {
-                **base_data,
-                'commission_rate': self.percentage_rate,
-                'commission_amount': payment.amount * (self.percentage_rate / 100.0),
-            }
+        if self.commission_type == 'fixed':
+            return [
+                {**data, 'commission_rate': 0, 'commission_amount': self.fixed_amount}
+                for data in base_data
+            ]
+        
+        if self.commission_type == 'percentage':
+            factor = self.percentage_rate / 100.0
+            return [
+                {**data, 'commission_rate': self.percentage_rate, 'commission_amount': data['payment_amount'] * factor}
+                for data in base_data
+            ]
         
-        elif self.commission_type == 'band' and self.band_id:
+        if self.commission_type == 'band' and self.band_id:
             # Calculate days overdue
-            days_overdue = (payment.date - invoice.invoice_date_due).days
+            days_overdue = [
+                (payment_dates[i] - due_dates[i]).days if payment_dates[i] and due_dates[i] else 0
+                for i in range(count)
+            ]
             
-            # Get commission rate from band
-            rate, indicator_rate, range_id = self.band_id.get_commission_rate(
-                days_overdue,
-                payment.amount,
-                payment.currency_id.id
-            )
+            # Get commission rates from band
+            rates = self.band_id.get_commission_rates(zip(days_overdue, payment_amounts, currency_ids))
             
-            if rate > 0:
-                return {
-                    **base_data,
-                    'band_id': self.band_id.id,
-                    'range_id': range_id,
-                    'days_overdue': days_overdue,
-                    'commission_rate': rate * 100,  # Convert to percentage
-                    'commission_amount': payment.amount * rate,
-                }
+            vals_list = []
+            for data, days, (rate, indicator_rate, range_id) in zip(base_data, days_overdue, rates):
+                if rate > 0:
+                    vals_list.append({
+                        **data,
+                        'band_id': self.band_id.id,
+                        'range_id': range_id,
+                        'days_overdue': days,
+                        'commission_rate': rate * 100,  # Convert to percentage
+                        'commission_amount': data['payment_amount'] * rate,
+                    })
+            return vals_list
         
-        return None
+        return []
 
     def copy(self, default=None):
         default = dict(default or {})
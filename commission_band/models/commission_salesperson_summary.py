@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Key of the (salesperson, company, month) summaries to refresh, kept in the cursor precommit data
+DIRTY_SUMMARY_KEYS_KEY = 'commission_band.dirty_summary_keys'
+
+# Aggregation of commission_calculation rows into summary rows
+SUMMARY_SELECT = """
+    SELECT c.salesperson_id,
+           c.company_id,
+           date_trunc('month', c.payment_date)::date,
+           c.state,
+           COUNT(*),
+           COALESCE(SUM(c.commission_amount), 0),
+           COALESCE(SUM(c.commission_amount_company), 0),
+           COALESCE(SUM(c.days_overdue) FILTER (WHERE c.days_overdue != 0), 0),
+           COUNT(*) FILTER (WHERE c.days_overdue != 0)
+"""
+
+SUMMARY_COLUMNS = """
+    salesperson_id, company_id, month, state, calculation_count, commission_amount,
+    commission_amount_company, days_overdue_sum, days_overdue_count
+"""
+
+SUMMARY_UPDATE = """
+    calculation_count = EXCLUDED.calculation_count,
+    commission_amount = EXCLUDED.commission_amount,
+    commission_amount_company = EXCLUDED.commission_amount_company,
+    days_overdue_sum = EXCLUDED.days_overdue_sum,
+    days_overdue_count = EXCLUDED.days_overdue_count
+"""
+
+
+class CommissionSalespersonSummary(models.Model):
+    _name = 'commission.salesperson.summary'
+    _description = 'Commission Summary per Salesperson and Month'
+    _order = 'month desc, salesperson_id'
+    _log_access = False
+
+    salesperson_id = fields.Many2one(
+        'res.users',
+        string='Salesperson',
+        required=True,
+        readonly=True,
+        ondelete='cascade'
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        string='Company',
+        required=True,
+        readonly=True,
+        ondelete='cascade'
+    )
+    month = fields.Date(
+        string='Month',
+        required=True,
+        readonly=True,
+        help="First day of the month of the payment date"
+    )
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('calculated', 'Calculated'),
+        ('validated', 'Validated'),
+        ('approved', 'Approved'),
+        ('paid', 'Paid'),
+        ('cancelled', 'Cancelled')
+    ], string='State', required=True, readonly=True)
+    calculation_count = fields.Integer(
+        string='Calculations',
+        readonly=True
+    )
+    commission_amount = fields.Float(
+        string='Commission Amount',
+        readonly=True,
+        help="Sum of commission amounts in their own currencies"
+    )
+    commission_amount_company = fields.Float(
+        string='Commission (Company Currency)',
+        readonly=True
+    )
+    days_overdue_sum = fields.Integer(
+        string='Days Overdue (Sum)',
+        readonly=True,
+        help="Sum of non-zero days overdue"
+    )
+    days_overdue_count = fields.Integer(
+        string='Days Overdue (Count)',
+        readonly=True,
+        help="Number of calculations with non-zero days overdue"
+    )
+
+    _sql_constraints = [
+        ('key_uniq', 'UNIQUE(salesperson_id, company_id, month, state)',
+         'Only one summary per salesperson, company, month and state is allowed!'),
+    ]
+
+    def init(self):
+        """Rebuild the whole summary table from the commission calculations"""
+        self._rebuild()
+
+    @api.model
+    def _rebuild(self):
+        """Recompute every summary row"""
+        self.env['commission.calculation'].flush_model()
+        self.env.execute_query(SQL("DELETE FROM commission_salesperson_summary"))
+        self.env.execute_query(SQL(
+            f"""INSERT INTO commission_salesperson_summary ({SUMMARY_COLUMNS})
+                {SUMMARY_SELECT}
+                  FROM commission_calculation c
+                 WHERE c.salesperson_id IS NOT NULL
+                   AND c.company_id IS NOT NULL
+                   AND c.payment_date IS NOT NULL
+                 GROUP BY 1, 2, 3, 4"""
+        ))
+        self.env.invalidate_all()
+        _logger.info("Commission salesperson summary rebuilt")
+
+    @api.model
+    def _mark_dirty(self, calculations):
+        """Record the summary keys touched by the given calculations
+        
+        Keys are refreshed before the summary is read and at the latest
+        right before commit.
+        
+        Args:
+            calculations: commission.calculation recordset
+        """
+        self._add_dirty_keys({
+            (calc.salesperson_id.id, calc.company_id.id, calc.payment_date.replace(day=1))
+            for calc in calculations
+            if calc.salesperson_id and calc.company_id and calc.payment_date
+        })
+
+    @api.model
+    def _mark_dirty_stored(self, calculation_ids):
+        """Record the summary keys of calculations as stored in the database
+        
+        Used before a recomputation moves calculations to another month: the
+        cache already holds the new payment date, the database the old one.
+        
+        Args:
+            calculation_ids: commission.calculation ids
+        """
+        if not calculation_ids:
+            return
+        rows = self.env.execute_query(SQL(
+            """SELECT DISTINCT salesperson_id, company_id, date_trunc('month', payment_date)::date
+                 FROM commission_calculation
+                WHERE id = ANY(%s)
+                  AND salesperson_id IS NOT NULL
+                  AND company_id IS NOT NULL
+                  AND payment_date IS NOT NULL""",
+            list(calculation_ids),
+        ))
+        self._add_dirty_keys({tuple(row) for row in rows})
+
+    @api.model
+    def _add_dirty_keys(self, keys):
+        """Add (salesperson_id, company_id, month) keys to refresh before commit"""
+        if not keys:
+            return
+        
+        data = self.env.cr.precommit.data
+        dirty_keys = data.get(DIRTY_SUMMARY_KEYS_KEY)
+        if dirty_keys is None:
+            dirty_keys = data[DIRTY_SUMMARY_KEYS_KEY] = set()
+            self.env.cr.precommit.add(self._refresh_dirty)
+        dirty_keys.update(keys)
+
+    @api.model
+    def _refresh_dirty(self):
+        """Recompute the summary rows of the keys recorded by _mark_dirty
+        
+        Rows are upserted rather than deleted and inserted again: when two
+        transactions refresh the same key, the second one fails with a
+        serialization error, which is retried, instead of a unique violation.
+        Rows of states without calculations left are deleted afterwards.
+        """
+        dirty_keys = self.env.cr.precommit.data.get(DIRTY_SUMMARY_KEYS_KEY)
+        if not dirty_keys:
+            return
+        
+        self.env['commission.calculation'].flush_model()
+        keys = list(dirty_keys)
+        dirty_keys.clear()
+        
+        salesperson_ids = [key[0] for key in keys]
+        company_ids = [key[1] for key in keys]
+        months = [key[2] for key in keys]
+        self.env.execute_query(SQL(
+            f"""INSERT INTO commission_salesperson_summary ({SUMMARY_COLUMNS})
+                {SUMMARY_SELECT}
+                  FROM commission_calculation c
+                  JOIN unnest(%s::int[], %s::int[], %s::date[]) AS k(salesperson_id, company_id, month)
+                    ON c.salesperson_id = k.salesperson_id
+                   AND c.company_id = k.company_id
+                   AND date_trunc('month', c.payment_date)::date = k.month
+                 GROUP BY 1, 2, 3, 4
+                    ON CONFLICT (salesperson_id, company_id, month, state) DO UPDATE SET {SUMMARY_UPDATE}""",
+            salesperson_ids, company_ids, months,
+        ))
+        self.env.execute_query(SQL(
+            """DELETE FROM commission_salesperson_summary s
+                USING unnest(%s::int[], %s::int[], %s::date[]) AS k(salesperson_id, company_id, month)
+                WHERE s.salesperson_id = k.salesperson_id
+                  AND s.company_id = k.company_id
+                  AND s.month = k.month
+                  AND NOT EXISTS (
+                      SELECT 1
+                        FROM commission_calculation c
+                       WHERE c.salesperson_id = s.salesperson_id
+                         AND c.company_id = s.company_id
+                         AND date_trunc('month', c.payment_date)::date = s.month
+                         AND c.state = s.state
+                  )""",
+            salesperson_ids, company_ids, months,
+        ))
+        self.invalidate_model()
+
+    @api.model
+    def _cron_rebuild(self):
+        """Cron job rebuilding the summary, in case calculations were changed outside the ORM"""
+        self._rebuild()
+        return True
+
+    @api.model
+    def _get_statistics(self, salesperson_ids, company_ids, states=None):
+        """Aggregate the summary per (salesperson, company)
+        
+        Reading never writes the summary, it may run on a read-only cursor.
+        Keys marked dirty in the current transaction are aggregated from the
+        calculations instead, their rows are refreshed before commit.
+        
+        Args:
+            salesperson_ids: res.users ids
+            company_ids: res.company ids
+            states: Calculation states to include (optional, all states by default)
+        
+        Returns:
+            dict: {(salesperson_id, company_id): {'count', 'amount', 'amount_company', 'avg_days'}}
+        """
+        salesperson_set, company_set = set(salesperson_ids), set(company_ids)
+        dirty_keys = {
+            key for key in self.env.cr.precommit.data.get(DIRTY_SUMMARY_KEYS_KEY) or ()
+            if key[0] in salesperson_set and key[1] in company_set
+        }
+        
+        domain = [
+            ('salesperson_id', 'in', salesperson_ids),
+            ('company_id', 'in', company_ids),
+        ]
+        if states:
+            domain.append(('state', 'in', states))
+        
+        totals = {}
+
+        def add(key, count, amount, amount_company, days_sum, days_count):
+            total = totals.setdefault(key, [0, 0.0, 0.0, 0, 0])
+            for index, value in enumerate((count, amount, amount_company, days_sum, days_count)):
+                total[index] += value
+
+        for salesperson, company, month, *values in self._read_group(
+            domain,
+            groupby=['salesperson_id', 'company_id', 'month:day'],
+            aggregates=['calculation_count:sum', 'commission_amount:sum', 'commission_amount_company:sum',
+                        'days_overdue_sum:sum', 'days_overdue_count:sum'],
+        ):
+            if (salesperson.id, company.id, month) not in dirty_keys:
+                add((salesperson.id, company.id), *values)
+        
+        if dirty_keys:
+            Calculation = self.env['commission.calculation']
+            Calculation.flush_model()
+            calculation_domain = [('state', 'in', states)] if states else []
+            keys = list(dirty_keys)
+            for salesperson_id, company_id, _month, _state, *values in self.env.execute_query(SQL(
+                f"""{SUMMARY_SELECT}
+                      FROM commission_calculation c
+                      JOIN unnest(%s::int[], %s::int[], %s::date[]) AS k(salesperson_id, company_id, month)
+                        ON c.salesperson_id = k.salesperson_id
+                       AND c.company_id = k.company_id
+                       AND date_trunc('month', c.payment_date)::date = k.month
+                     WHERE c.id IN %s
+                     GROUP BY 1, 2, 3, 4""",
+                [key[0] for key in keys], [key[1] for key in keys], [key[2] for key in keys],
+                Calculation._search(calculation_domain).subselect(),
+            )):
+                add((salesperson_id, company_id), *values)
+        
+        return {
+            key: {
+                'count': count,
+                'amount': amount,
+                'amount_company': amount_company,
+                'avg_days': days_sum / days_count if days_count else 0.0,
+            }
+            for key, (count, amount, amount_company, days_sum, days_count) in totals.items()
+        }
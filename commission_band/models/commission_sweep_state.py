@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+
+class CommissionSweepState(models.Model):
+    _name = 'commission.sweep.state'
+    _description = 'Commission Cron Sweep Position'
+    _log_access = False
+
+    key = fields.Char(
+        string='Key',
+        required=True,
+        readonly=True
+    )
+    last_id = fields.Integer(
+        string='Last Processed Id',
+        readonly=True
+    )
+
+    _sql_constraints = [
+        ('key_uniq', 'UNIQUE(key)', 'Only one position per sweep is allowed!'),
+    ]
+
+    @api.model
+    def _get_last_id(self, key):
+        """Return the last id processed by the sweep, 0 when it never ran
+        
+        The position is kept in its own table rather than in a system
+        parameter: writing ir.config_parameter clears the registry caches of
+        every worker.
+        """
+        rows = self.env.execute_query(SQL(
+            "SELECT last_id FROM commission_sweep_state WHERE key = %s", key,
+        ))
+        return rows[0][0] if rows else 0
+
+    @api.model
+    def _set_last_id(self, key, last_id):
+        """Store the last id processed by the sweep"""
+        self.env.execute_query(SQL(
+            """INSERT INTO commission_sweep_state (key, last_id)
+               VALUES (%s, %s)
+               ON CONFLICT (key) DO UPDATE SET last_id = EXCLUDED.last_id""",
+            key, last_id,
+        ))
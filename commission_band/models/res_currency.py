@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, tools
+
+
+class ResCurrency(models.Model):
+    _inherit = 'res.currency'
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'name' in vals or 'active' in vals:
+            self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    def _get_commission_currency(self, name):
+        """Get a currency by its ISO code, memoized for commission models
+        
+        Args:
+            name: ISO code of the currency (e.g. 'USD', 'VES')
+            
+        Returns:
+            res.currency record (empty if not found)
+        """
+        return self.browse(self._get_commission_currency_id(name))
+
+    @tools.ormcache('name')
+    def _get_commission_currency_id(self, name):
+        return self.sudo().search([('name', '=', name)], limit=1).id
+
+    @api.model
+    def _get_commission_rate(self, from_currency, to_currency, company, date):
+        """Get the conversion rate between two currencies, memoized for commission models
+        
+        Args:
+            from_currency: res.currency record
+            to_currency: res.currency record
+            company: res.company record
+            date: Date of the rate
+            
+        Returns:
+            float: Conversion rate
+        """
+        if from_currency == to_currency:
+            return 1.0
+        return self._get_commission_rate_cached(
+            from_currency.id, to_currency.id, company.id, fields.Date.to_date(date)
+        )
+
+    @tools.ormcache('from_currency_id', 'to_currency_id', 'company_id', 'date')
+    def _get_commission_rate_cached(self, from_currency_id, to_currency_id, company_id, date):
+        Currency = self.sudo()
+        return Currency._get_conversion_rate(
+            Currency.browse(from_currency_id),
+            Currency.browse(to_currency_id),
+            self.env['res.company'].sudo().browse(company_id),
+            date
+        )
+
+    @api.model
+    def _commission_convert(self, amount, from_currency, to_currency, company, date):
+        """Convert an amount using the memoized commission rates
+        
+        Returns:
+            float: Amount in to_currency, rounded to its precision
+        """
+        if from_currency == to_currency:
+            return amount
+        rate = self._get_commission_rate(from_currency, to_currency, company, date)
+        return to_currency.round(amount * rate)
+
+
+class ResCurrencyRate(models.Model):
+    _inherit = 'res.currency.rate'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        rates = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return rates
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
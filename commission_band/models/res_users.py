@@ -64,25 +64,17 @@ class ResUsers(models.Model):
 
     @api.depends('commission_config_ids')
     def _compute_commission_stats(self):
-        """Compute commission statistics for the user"""
+        """Compute commission statistics for the user from the salesperson summary"""
+        statistics = self.env['commission.salesperson.summary']._get_statistics(
+            self.ids,
+            self.company_id.ids,
+            states=['validated', 'approved', 'paid'],
+        )
         for user in self:
-            calculations = self.env['commission.calculation'].search([
-                ('salesperson_id', '=', user.id),
-                ('company_id', '=', user.company_id.id),
-                ('state', 'in', ['validated', 'approved', 'paid'])
-            ])
-            
-            user.commission_calculation_count = len(calculations)
-            
-            # Convert all amounts to company currency for summing
-            total = 0.0
-            for calc in calculations:
-                total += calc.commission_amount_company
-            user.total_commission_amount = total
-            
-            # Calculate average collection days
-            days_list = calculations.filtered('days_overdue').mapped('days_overdue')
-            user.avg_collection_days = sum(days_list) / len(days_list) if days_list else 0.0
+            stats = statistics.get((user.id, user.company_id.id), {})
+            user.commission_calculation_count = stats.get('count', 0)
+            user.total_commission_amount = stats.get('amount_company', 0.0)
+            user.avg_collection_days = stats.get('avg_days', 0.0)
 
     def get_applicable_commission_rule(self, invoice=None, payment=None):
         """Get the applicable commission rule for this user
@@ -110,26 +102,12 @@ class ResUsers(models.Model):
             _logger.info("Commission not active in configuration for user %s", self.name)
             return False
         
-        # Search for applicable rules
-        domain = [
-            ('active', '=', True),
-            ('company_id', '=', invoice.company_id.id if invoice else self.company_id.id)
-        ]
-        
-        # Add date filter if payment exists
-        if payment:
-            domain.extend([
-                '|', ('date_from', '=', False), ('date_from', '<=', payment.date),
-                '|', ('date_to', '=', False), ('date_to', '>=', payment.date),
-            ])
-        
-        rules = self.env['commission.rule'].search(domain, order='priority, sequence')
-        
-        # Find first matching rule
-        for rule in rules:
-            if rule.matches_criteria(invoice, payment, self):
-                _logger.info("Found applicable rule %s for user %s", rule.name, self.name)
-                return rule
+        # Resolve the first matching rule from the compiled rule index
+        company_id = invoice.company_id.id if invoice else self.company_id.id
+        rule = self.env['commission.rule']._find_matching_rule(company_id, invoice, payment, self)
+        if rule:
+            _logger.info("Found applicable rule %s for user %s", rule.name, self.name)
+            return rule
         
         # Check for default rule in config
         if config and config.default_rule_id and config.default_rule_id.active:
@@ -124,33 +124,28 @@ class SalespersonConfig(models.Model):
             config.display_name = name
 
     def _compute_calculation_count(self):
+        statistics = self.env['commission.salesperson.summary']._get_statistics(
+            self.user_id.ids, self.company_id.ids
+        )
         for config in self:
-            config.calculation_count = self.env['commission.calculation'].search_count([
-                ('salesperson_id', '=', config.user_id.id),
-                ('company_id', '=', config.company_id.id)
-            ])
+            stats = statistics.get((config.user_id.id, config.company_id.id), {})
+            config.calculation_count = stats.get('count', 0)
 
     def _compute_total_commission(self):
+        statistics = self.env['commission.salesperson.summary']._get_statistics(
+            self.user_id.ids, self.company_id.ids, states=['validated', 'approved', 'paid']
+        )
         for config in self:
-            calculations = self.env['commission.calculation'].search([
-                ('salesperson_id', '=', config.user_id.id),
-                ('company_id', '=', config.company_id.id),
-                ('state', 'in', ['validated', 'approved', 'paid'])
-            ])
-            config.total_commission = sum(calculations.mapped('commission_amount'))
+            stats = statistics.get((config.user_id.id, config.company_id.id), {})
+            config.total_commission = stats.get('amount', 0.0)
 
     def _compute_avg_collection_days(self):
+        statistics = self.env['commission.salesperson.summary']._get_statistics(
+            self.user_id.ids, self.company_id.ids, states=['validated', 'approved', 'paid']
+        )
         for config in self:
-            calculations = self.env['commission.calculation'].search([
-                ('salesperson_id', '=', config.user_id.id),
-                ('company_id', '=', config.company_id.id),
-                ('state', 'in', ['validated', 'approved', 'paid']),
-                ('days_overdue', '!=', False)
-            ])
-            if calculations:
-                config.avg_collection_days = sum(calculations.mapped('days_overdue')) / len(calculations)
-            else:
-                config.avg_collection_days = 0
+            stats = statistics.get((config.user_id.id, config.company_id.id), {})
+            config.avg_collection_days = stats.get('avg_days', 0.0)
 
     @api.constrains('override_commission_type', 'override_percentage', 'override_fixed_amount', 'override_band_id')
     def _check_override_config(self):
@@ -0,0 +1,26 @@
+/** @odoo-module **/
+
+import { registry } from "@web/core/registry";
+
+/**
+ * Reload the view showing a commission job, or the batch it belongs to,
+ * when the job reports progress over the bus.
+ */
+export const commissionJobProgressService = {
+    dependencies: ["action", "bus_service"],
+    start(env, { action, bus_service }) {
+        bus_service.subscribe("commission_band.job_progress", (payload) => {
+            const props = action.currentController?.props;
+            if (!props) {
+                return;
+            }
+            const showsJob = props.resModel === "commission.job" && (!props.resId || props.resId === payload.job_id);
+            const showsBatch = props.resModel === "commission.batch" && payload.batch_id && props.resId === payload.batch_id;
+            if (showsJob || showsBatch) {
+                action.doAction("soft_reload");
+            }
+        });
+    },
+};
+
+registry.category("services").add("commission_band.job_progress", commissionJobProgressService);
@@ -0,0 +1,3 @@
+from . import test_commission_engine
+from . import test_commission_indexes
+from . import test_commission_benchmark
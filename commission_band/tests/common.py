@@ -0,0 +1,129 @@
+import logging
+import os
+import random
+from datetime import date, timedelta
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests.common import new_test_user
+
+_logger = logging.getLogger(__name__)
+
+
+class CommissionDataCommon(AccountTestInvoicingCommon):
+    """Synthetic commission data: salespersons, bands with ranges, rules and
+    posted, paid invoices in several currencies.
+
+    The volume is set with the class attributes below, or with the
+    COMMISSION_BENCHMARK_SALESPERSONS, COMMISSION_BENCHMARK_RULES and
+    COMMISSION_BENCHMARK_INVOICES environment variables. Data is generated
+    with a fixed seed so runs are comparable.
+    """
+
+    salesperson_count = 5
+    rule_count = 4
+    invoice_count = 60
+    seed = 42
+
+    # Period of the generated payments
+    period_start = date(2025, 1, 1)
+    period_end = date(2025, 1, 31)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        
+        cls.salesperson_count = int(os.environ.get('COMMISSION_BENCHMARK_SALESPERSONS', cls.salesperson_count))
+        cls.rule_count = int(os.environ.get('COMMISSION_BENCHMARK_RULES', cls.rule_count))
+        cls.invoice_count = int(os.environ.get('COMMISSION_BENCHMARK_INVOICES', cls.invoice_count))
+        cls.random = random.Random(cls.seed)
+        
+        cls.currency_usd = cls.env.ref('base.USD')
+        cls.currency_ves = cls.setup_other_currency('VES', rounding=0.01, rates=[('2024-01-01', 40.0)])
+        
+        cls._generate_commission_data()
+
+    @classmethod
+    def _generate_commission_data(cls):
+        company = cls.env.company
+        
+        # Salespersons with their commission configuration
+        cls.salespersons = cls.env['res.users']
+        for index in range(cls.salesperson_count):
+            cls.salespersons |= new_test_user(
+                cls.env,
+                login='commission_salesperson_%d' % index,
+                groups='sales_team.group_sale_salesman,commission_band.group_commission_band_user',
+                company_id=company.id,
+            )
+        cls.env['salesperson.config'].create([{
+            'user_id': user.id,
+            'company_id': company.id,
+            'commission_active': True,
+        } for user in cls.salespersons])
+        
+        # Bands covering early, on time and late payments
+        cls.bands = cls.env['commission.band'].create([{
+            'name': 'Benchmark Band %d' % index,
+            'code': 'BENCH%d' % index,
+            'company_id': company.id,
+            'range_ids': [
+                (0, 0, {'name': 'Early', 'day_from': -9999, 'day_to': 0, 'commission_rate': 3.0 + index}),
+                (0, 0, {'name': '1-30', 'day_from': 1, 'day_to': 30, 'commission_rate': 2.0 + index}),
+                (0, 0, {'name': '31-60', 'day_from': 31, 'day_to': 60, 'commission_rate': 1.0 + index}),
+                (0, 0, {'name': 'Late', 'day_from': 61, 'day_to': 9999, 'commission_rate': 0.5}),
+            ],
+        } for index in range(max(1, cls.rule_count // 2))])
+        
+        # Rules: one per group of salespersons, plus a catch-all rule
+        salesperson_ids = cls.salespersons.ids
+        rule_vals = []
+        for index in range(cls.rule_count):
+            vals = {
+                'name': 'Benchmark Rule %d' % index,
+                'code': 'BENCH_RULE_%d' % index,
+                'company_id': company.id,
+                'priority': 10 + index,
+                'commission_type': 'band',
+                'band_id': cls.bands[index % len(cls.bands)].id,
+            }
+            if index:
+                vals['salesperson_ids'] = [(6, 0, salesperson_ids[index::cls.rule_count])]
+            rule_vals.append(vals)
+        cls.rules = cls.env['commission.rule'].create(rule_vals)
+        
+        # Posted invoices, spread over the two months before the period
+        partners = cls.partner_a | cls.partner_b
+        currencies = cls.currency_usd | cls.currency_ves
+        invoices = cls.env['account.move']
+        for index in range(cls.invoice_count):
+            invoice_date = cls.period_start - timedelta(days=cls.random.randint(0, 75))
+            invoice = cls.init_invoice(
+                'out_invoice',
+                partner=partners[index % len(partners)],
+                invoice_date=invoice_date,
+                amounts=[cls.random.randint(100, 5000)],
+                currency=currencies[index % len(currencies)],
+            )
+            invoice.invoice_user_id = cls.salespersons[index % len(cls.salespersons)]
+            invoices |= invoice
+        invoices.action_post()
+        cls.invoices = invoices
+        
+        # One payment per invoice, collected at different dates of the period
+        payment_dates = [cls.period_start + timedelta(days=offset) for offset in (4, 14, 24)]
+        payments = cls.env['account.payment']
+        for index, payment_date in enumerate(payment_dates):
+            bucket = invoices[index::len(payment_dates)]
+            if not bucket:
+                continue
+            payments |= cls.env['account.payment.register'].with_context(
+                active_model='account.move',
+                active_ids=bucket.ids,
+            ).create({
+                'payment_date': payment_date,
+                'group_payment': False,
+            })._create_payments()
+        cls.payments = payments
+        
+        _logger.info("Generated commission data: %d salespersons, %d rules, %d bands, %d invoices, %d payments",
+                     len(cls.salespersons), len(cls.rules), len(cls.bands), len(cls.invoices), len(cls.payments))
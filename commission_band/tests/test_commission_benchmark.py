@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from odoo.tests import HttpCase, tagged
+from odoo.tests.common import new_test_user
+
+from .common import CommissionDataCommon
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install', '-standard', 'commission_benchmark')
+class TestCommissionBenchmark(CommissionDataCommon, HttpCase):
+    """Timings and query counts of every stage of the commission pipeline
+
+    Not part of the standard run, use --test-tags commission_benchmark.
+    Results are logged and, when COMMISSION_BENCHMARK_OUTPUT is set, written
+    to that file as JSON so runs can be compared. Correctness of the stages
+    is covered by the standard tests.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.results = []
+
+    @contextmanager
+    def _stage(self, name, items=0):
+        """Measure the wall time and the number of queries of a stage"""
+        self.env.flush_all()
+        self.env.invalidate_all()
+        self.env.registry.clear_cache()
+        queries_before = self.env.cr.sql_log_count
+        started = time.perf_counter()
+        yield
+        self.env.flush_all()
+        self.results.append({
+            'stage': name,
+            'items': items,
+            'seconds': round(time.perf_counter() - started, 4),
+            'queries': self.env.cr.sql_log_count - queries_before,
+        })
+
+    def _report(self):
+        lines = ["%-32s %8s %10s %8s" % ('Stage', 'Items', 'Seconds', 'Queries')]
+        for result in self.results:
+            lines.append("%-32s %8d %10.4f %8d" % (
+                result['stage'], result['items'], result['seconds'], result['queries']
+            ))
+        _logger.info("Commission benchmark (%d salespersons, %d rules, %d invoices)\n%s",
+                     len(self.salespersons), len(self.rules), len(self.invoices), '\n'.join(lines))
+        
+        output = os.environ.get('COMMISSION_BENCHMARK_OUTPUT')
+        if output:
+            with open(output, 'w') as output_file:
+                json.dump({
+                    'salespersons': len(self.salespersons),
+                    'rules': len(self.rules),
+                    'invoices': len(self.invoices),
+                    'stages': self.results,
+                }, output_file, indent=2)
+
+    def _export(self, url):
+        """Download an export route and return the response body"""
+        response = self.url_open(url, timeout=600)
+        response.raise_for_status()
+        return response.content
+
+    def test_commission_pipeline(self):
+        Calculation = self.env['commission.calculation']
+        pairs = [
+            (payment, invoice)
+            for payment in self.payments
+            for invoice in payment.reconciled_invoice_ids
+        ]
+        
+        with self._stage('rule resolution', len(pairs)):
+            for payment, invoice in pairs:
+                invoice.invoice_user_id.get_applicable_commission_rule(invoice, payment)
+        
+        half = len(self.payments) // 2
+        single_payments, bulk_payments = self.payments[:half], self.payments[half:]
+        
+        with self._stage('calculation per payment', len(single_payments)):
+            for payment in single_payments:
+                Calculation._calculate_commission_from_payment(payment.id)
+        
+        with self._stage('calculation in bulk', len(bulk_payments)):
+            Calculation._calculate_commissions_from_payments(bulk_payments)
+        
+        calculation_count = Calculation.search_count([('payment_id', 'in', self.payments.ids)])
+        
+        batch = self.env['commission.batch'].create({
+            'name': 'Benchmark Batch',
+            'date_from': self.period_start,
+            'date_to': self.period_end,
+            'payment_date': self.period_end,
+        })
+        with self._stage('batch calculation', calculation_count):
+            batch._run_calculate()
+        
+        batch.action_review()
+        with self._stage('payment document generation', calculation_count):
+            document = batch._run_generate_payment_document()
+        
+        new_test_user(self.env, login='commission_benchmark_manager',
+                      groups='base.group_user,commission_band.group_commission_band_manager')
+        self.authenticate('commission_benchmark_manager', 'commission_benchmark_manager')
+        
+        with self._stage('xlsx export', calculation_count):
+            content = self._export('/commission_band/payment_document/%d/export/stream' % document.id)
+        self.assertTrue(content)
+        
+        with self._stage('csv export', calculation_count):
+            content = self._export('/commission_band/payment_document/%d/export/csv' % document.id)
+        self.assertTrue(content)
+        
+        self._report()
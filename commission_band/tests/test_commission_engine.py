@@ -0,0 +1,245 @@
+from datetime import timedelta
+
+from odoo.tests import tagged
+
+from .common import CommissionDataCommon
+
+
+@tagged('post_install', '-at_install')
+class TestCommissionEngine(CommissionDataCommon):
+    """The optimized rule index, band lookup, bulk engine, payment queue and
+    salesperson summary give the same results as the straightforward code"""
+
+    salesperson_count = 3
+    rule_count = 4
+    invoice_count = 12
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        company = cls.env.company
+
+        # Restrictive rules evaluated before the generated ones
+        cls.env['commission.rule'].create([
+            {
+                'name': 'Customer Rule',
+                'code': 'ENGINE_CUSTOMER',
+                'company_id': company.id,
+                'priority': 1,
+                'commission_type': 'percentage',
+                'percentage_rate': 1.0,
+                'customer_ids': [(6, 0, cls.partner_a.ids)],
+                'min_amount': 2500,
+            },
+            {
+                'name': 'Expired Rule',
+                'code': 'ENGINE_EXPIRED',
+                'company_id': company.id,
+                'priority': 2,
+                'commission_type': 'fixed',
+                'fixed_amount': 10.0,
+                'date_to': cls.period_start - timedelta(days=1),
+            },
+            {
+                'name': 'Journal Rule',
+                'code': 'ENGINE_JOURNAL',
+                'company_id': company.id,
+                'priority': 3,
+                'commission_type': 'fixed',
+                'fixed_amount': 5.0,
+                'journal_ids': [(6, 0, cls.company_data['default_journal_cash'].ids)],
+            },
+            {
+                'name': 'Salesperson Rule',
+                'code': 'ENGINE_SALESPERSON',
+                'company_id': company.id,
+                'priority': 4,
+                'commission_type': 'percentage',
+                'percentage_rate': 2.0,
+                'salesperson_ids': [(6, 0, cls.salespersons[:1].ids)],
+                'max_amount': 3000,
+            },
+        ])
+
+    def _pairs(self):
+        return [
+            (payment, invoice)
+            for payment in self.payments
+            for invoice in payment.reconciled_invoice_ids
+        ]
+
+    def _calculate_all(self):
+        return self.env['commission.calculation']._calculate_commissions_from_payments(self.payments)
+
+    def test_rule_index_matches_criteria(self):
+        """The compiled rule index picks the rule matches_criteria would pick"""
+        Rule = self.env['commission.rule']
+        rules = Rule.search([('active', '=', True), ('company_id', '=', self.env.company.id)],
+                            order='priority, sequence')
+
+        for payment, invoice in self._pairs():
+            salesperson = invoice.invoice_user_id
+            expected = next(
+                (rule for rule in rules if rule.matches_criteria(invoice, payment, salesperson)),
+                Rule,
+            )
+            self.assertEqual(
+                Rule._find_matching_rule(self.env.company.id, invoice, payment, salesperson), expected,
+                "Rule index and matches_criteria disagree for %s / %s" % (payment.name, invoice.name),
+            )
+
+    def test_band_lookup_boundaries(self):
+        """Bisection finds the same range as a linear scan, gaps included"""
+        band = self.env['commission.band'].create({
+            'name': 'Gap Band',
+            'code': 'GAP',
+            'company_id': self.env.company.id,
+            'range_ids': [
+                (0, 0, {'name': 'Early', 'day_from': -999, 'day_to': 0, 'commission_rate': 3.0}),
+                (0, 0, {'name': 'Big', 'day_from': 5, 'day_to': 10, 'commission_rate': 2.0,
+                        'min_payment_amount': 100}),
+                (0, 0, {'name': 'Late', 'day_from': 20, 'day_to': 999, 'commission_rate': 1.0}),
+            ],
+        })
+
+        for days in (-1000, -999, -1, 0, 1, 4, 5, 10, 11, 19, 20, 999, 1000):
+            for amount in (50, 100):
+                expected = next(
+                    (
+                        (r.commission_rate / 100.0, r.indicator_rate / 100.0, r.id)
+                        for r in band.range_ids
+                        if r.day_from <= days <= r.day_to
+                        and not (r.min_payment_amount and amount < r.min_payment_amount)
+                    ),
+                    (0.0, 0.0, False),
+                )
+                self.assertEqual(band.get_commission_rate(days, amount), expected,
+                                 "Wrong range for %d days and amount %d" % (days, amount))
+
+    def test_bulk_engine_matches_per_payment(self):
+        """The bulk engine creates the calculations rule.calculate_commission gives per payment"""
+        expected = {}
+        for payment, invoice in self._pairs():
+            salesperson = invoice.invoice_user_id
+            rule = salesperson.get_applicable_commission_rule(invoice, payment)
+            vals = rule and rule.calculate_commission(payment, invoice, salesperson)
+            if vals:
+                expected[payment.id, invoice.id] = (rule.id, vals.get('range_id', False), vals['commission_amount'])
+
+        calculations = self._calculate_all()
+        self.assertEqual(
+            {(calc.payment_id.id, calc.invoice_id.id) for calc in calculations}, set(expected),
+            "The bulk engine and the per-payment calculation disagree on the commissioned pairs",
+        )
+        for calc in calculations:
+            rule_id, range_id, amount = expected[calc.payment_id.id, calc.invoice_id.id]
+            self.assertEqual(calc.rule_id.id, rule_id)
+            self.assertEqual(calc.range_id.id, range_id)
+            self.assertAlmostEqual(calc.commission_amount, calc.currency_id.round(amount))
+
+        # A second pass does not create duplicates
+        self.assertFalse(self._calculate_all())
+
+    def test_payment_queue(self):
+        """Payments marked dirty are queued once and calculated by the queue cron"""
+        Queue = self.env['commission.payment.queue']
+        self.payments._mark_commission_dirty()
+        self.payments[:2]._mark_commission_dirty()
+        self.env.cr.flush()
+
+        queued = Queue.search([])
+        self.assertEqual(sorted(queued.payment_id.ids), sorted(self.payments.ids),
+                         "Every payment should be queued exactly once")
+
+        Queue._cron_process_queue(chunk_size=len(self.payments))
+        self.assertFalse(Queue.search_count([]))
+        self.assertTrue(all(self.payments.mapped('has_valid_commission')))
+
+    def _assert_summary_matches(self):
+        Summary = self.env['commission.salesperson.summary']
+        Summary._refresh_dirty()
+
+        actual = {
+            (summary.salesperson_id.id, summary.month, summary.state): (
+                summary.calculation_count, round(summary.commission_amount, 2),
+            )
+            for summary in Summary.search([('salesperson_id', 'in', self.salespersons.ids)])
+        }
+        expected = {
+            (salesperson.id, month, state): (count, round(amount, 2))
+            for salesperson, month, state, count, amount in self.env['commission.calculation']._read_group(
+                [('salesperson_id', 'in', self.salespersons.ids)],
+                groupby=['salesperson_id', 'payment_date:month', 'state'],
+                aggregates=['__count', 'commission_amount:sum'],
+            )
+        }
+        self.assertEqual(actual, expected)
+
+    def test_summary_refresh(self):
+        """The summary follows creations, state changes and payment date moves"""
+        calculations = self._calculate_all()
+        self.assertTrue(calculations)
+        self._assert_summary_matches()
+
+        calculations[:3].write({'state': 'validated'})
+        self._assert_summary_matches()
+
+        # Moving a calculation to a payment of another month refreshes both months
+        other_payment = self.env['account.payment'].create({
+            'payment_type': 'inbound',
+            'partner_type': 'customer',
+            'partner_id': self.partner_a.id,
+            'amount': 100.0,
+            'date': self.period_end + timedelta(days=10),
+        })
+        calculations[-1:].payment_id = other_payment
+        self._assert_summary_matches()
+
+        calculations[:1].unlink()
+        self._assert_summary_matches()
+
+    def test_statistics_do_not_write(self):
+        """Statistics include the pending changes of the transaction without refreshing the summary"""
+        Summary = self.env['commission.salesperson.summary']
+        calculations = self._calculate_all()
+        self.assertTrue(calculations)
+        summary_count = Summary.search_count([])
+
+        statistics = Summary._get_statistics(self.salespersons.ids, [self.env.company.id])
+        self.assertEqual(Summary.search_count([]), summary_count, "Reading statistics must not write the summary")
+        for salesperson in self.salespersons:
+            count = self.env['commission.calculation'].search_count([
+                ('salesperson_id', '=', salesperson.id),
+                ('company_id', '=', self.env.company.id),
+            ])
+            self.assertEqual(statistics.get((salesperson.id, self.env.company.id), {}).get('count', 0), count)
+
+    def test_batch_totals_deltas(self):
+        """Batch counters and totals follow calculation changes like a full aggregation"""
+        calculations = self._calculate_all()
+        self.assertTrue(len(calculations) > 2)
+        batch = self.env['commission.batch'].create({
+            'name': 'Engine Batch',
+            'date_from': self.period_start,
+            'date_to': self.period_end,
+            'payment_date': self.period_end,
+        })
+
+        def assert_totals():
+            expected = batch._get_calculation_totals(batch.calculation_ids.ids).get(batch.id, [0, 0.0, 0.0])
+            self.assertEqual(batch.calculation_count, expected[0])
+            self.assertAlmostEqual(batch.total_commission_usd, expected[1], places=2)
+            self.assertAlmostEqual(batch.total_commission_ves, expected[2], places=2)
+
+        calculations.write({'batch_id': batch.id})
+        assert_totals()
+        self.assertEqual(batch.salesperson_count, len(calculations.salesperson_id))
+
+        calculations[:1].write({'state': 'cancelled'})
+        assert_totals()
+
+        calculations[1:2].write({'commission_amount': calculations[1].commission_amount + 10.0})
+        assert_totals()
+
+        calculations[2:3].unlink()
+        assert_totals()
@@ -0,0 +1,120 @@
+import logging
+
+from psycopg2 import IntegrityError
+
+from odoo.tests import TransactionCase, tagged
+from odoo.tools import SQL, mute_logger
+
+from odoo.addons.commission_band.models.commission_calculation import CALCULATION_INDEXES
+
+from .common import CommissionDataCommon
+
+_logger = logging.getLogger(__name__)
+CALCULATION_LOGGER = 'odoo.addons.commission_band.models.commission_calculation'
+
+
+@tagged('post_install', '-at_install')
+class TestCommissionIndexesExist(CommissionDataCommon):
+    """The indexes of CALCULATION_INDEXES are created and enforced"""
+
+    salesperson_count = 2
+    rule_count = 2
+    invoice_count = 3
+
+    def _existing_indexes(self):
+        index_names = [name for name, _definition, _unique in CALCULATION_INDEXES]
+        self.env.cr.execute("SELECT indexname FROM pg_indexes WHERE indexname = ANY(%s)", [index_names])
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    def _duplicate_calculation(self):
+        """Insert a second valid calculation for the pair of an existing one"""
+        calculation = self.env['commission.calculation']._calculate_commissions_from_payments(self.payments[:1])[:1]
+        self.assertTrue(calculation, "The payment should get a commission calculation")
+        self.env.flush_all()
+        self.env.cr.execute(
+            """INSERT INTO commission_calculation (payment_id, invoice_id, salesperson_id, company_id,
+                                                   currency_id, payment_amount, commission_amount, state)
+               SELECT payment_id, invoice_id, salesperson_id, company_id,
+                      currency_id, payment_amount, commission_amount, 'calculated'
+                 FROM commission_calculation
+                WHERE id = %s""",
+            [calculation.id],
+        )
+
+    def test_indexes_exist(self):
+        self.assertEqual(
+            self._existing_indexes(), {name for name, _definition, _unique in CALCULATION_INDEXES},
+            "All commission calculation indexes should exist",
+        )
+
+    def test_unique_index_rejects_duplicates(self):
+        with self.assertRaises(IntegrityError), mute_logger('odoo.sql_db'):
+            self._duplicate_calculation()
+
+    def test_unique_index_skipped_with_duplicates(self):
+        unique_name = next(name for name, _definition, unique in CALCULATION_INDEXES if unique)
+        self.env.cr.execute(SQL("DROP INDEX %s", SQL.identifier(unique_name)))
+        self._duplicate_calculation()
+        
+        with self.assertLogs(CALCULATION_LOGGER, 'ERROR') as logs:
+            self.env['commission.calculation'].init()
+        self.assertIn(unique_name, logs.output[0])
+        self.assertNotIn(unique_name, self._existing_indexes())
+
+
+@tagged('post_install', '-at_install', '-standard', 'commission_benchmark')
+class TestCommissionIndexes(TransactionCase):
+    """Query plans of the hot commission queries with and without the indexes
+    
+    Not part of the standard run, use --test-tags commission_benchmark.
+    The plans are logged; sequential scans are disabled so the planner
+    shows which index it would pick on a large table.
+    """
+    
+    def setUp(self):
+        super().setUp()
+        
+        self.hot_queries = {
+            'payment/invoice lookup': SQL(
+                """SELECT id FROM commission_calculation
+                    WHERE payment_id = %s AND invoice_id = %s AND state != 'cancelled'""",
+                1, 1,
+            ),
+            'batch calculation': SQL(
+                """SELECT id FROM commission_calculation
+                    WHERE payment_date >= %s AND payment_date <= %s
+                      AND batch_id IS NULL AND state != 'cancelled' AND company_id = %s""",
+                '2025-01-01', '2025-01-31', self.env.company.id,
+            ),
+            'salesperson statistics': SQL(
+                """SELECT COUNT(*), SUM(commission_amount_company) FROM commission_calculation
+                    WHERE salesperson_id = %s AND company_id = %s AND state IN ('validated', 'approved', 'paid')""",
+                self.env.uid, self.env.company.id,
+            ),
+        }
+        self.env.cr.execute("SET LOCAL enable_seqscan = off")
+    
+    def _explain(self, query):
+        self.env.cr.execute(SQL("EXPLAIN (ANALYZE, COSTS OFF, TIMING OFF, SUMMARY OFF) %s", query))
+        return '\n'.join(row[0] for row in self.env.cr.fetchall())
+    
+    def _plans(self):
+        return {name: self._explain(query) for name, query in self.hot_queries.items()}
+    
+    def test_query_plans(self):
+        """Log the plans before and after the indexes"""
+        index_names = [name for name, _definition, _unique in CALCULATION_INDEXES]
+        plans_after = self._plans()
+        
+        # Drop the indexes inside a savepoint to get the plans without them
+        self.env.cr.execute("SAVEPOINT commission_indexes_benchmark")
+        for name in index_names:
+            self.env.cr.execute(SQL("DROP INDEX %s", SQL.identifier(name)))
+        plans_before = self._plans()
+        self.env.cr.execute("ROLLBACK TO SAVEPOINT commission_indexes_benchmark")
+        
+        for name in self.hot_queries:
+            _logger.info("Query plan for %s\n--- before ---\n%s\n--- after ---\n%s",
+                         name, plans_before[name], plans_after[name])
+            self.assertNotEqual(plans_before[name], plans_after[name],
+                                "The %s query should use the new indexes" % name)
@@ -2,4 +2,5 @@
 
 from . import commission_band_config_wizard
 from . import commission_batch_create_wizard
-from . import commission_payment_export_wizard
\ No newline at end of file
+from . import commission_payment_export_wizard
+from . import commission_recalculate_wizard
\ No newline at end of file
@@ -29,6 +29,13 @@ class CommissionPaymentExportWizard(models.TransientModel):
         ('csv', 'CSV'),
     ], string='Export Format', default='xlsx', required=True)
     
+    include_detail = fields.Boolean(
+        string='Include Commission Detail',
+        default=False,
+        help="Excel: add a sheet with every commission calculation of the document. "
+             "CSV: export one row per commission calculation instead of one per salesperson."
+    )
+    
     file_data = fields.Binary(
         string='File',
         readonly=True
@@ -52,9 +59,24 @@ class CommissionPaymentExportWizard(models.TransientModel):
         if self.export_format == 'xlsx':
             if not XLSXWRITER_AVAILABLE:
                 raise UserError(_("xlsxwriter library is not installed. Please install it or use CSV format."))
-            self._generate_xlsx()
-        else:
-            self._generate_csv()
+            # Excel files are streamed with constant memory by the controller
+            return {
+                'type': 'ir.actions.act_url',
+                'url': '/commission_band/payment_document/%s/export/stream?detail=%s' % (
+                    self.document_id.id, '1' if self.include_detail else '0'
+                ),
+                'target': 'self',
+            }
+        
+        if self.include_detail:
+            # The detail can hold every calculation of the document, stream it
+            return {
+                'type': 'ir.actions.act_url',
+                'url': '/commission_band/payment_document/%s/export/csv' % self.document_id.id,
+                'target': 'self',
+            }
+        
+        self._generate_csv()
         
         # Return action to download the file
         return {
@@ -65,70 +87,6 @@ class CommissionPaymentExportWizard(models.TransientModel):
             'target': 'self',
         }
 
-    def _generate_xlsx(self):
-        """Generate Excel file"""
-        # Create Excel file in memory
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-        
-        # Define formats
-        title_format = workbook.add_format({
-            'bold': True,
-            'font_size': 16,
-            'align': 'center',
-            'valign': 'vcenter',
-            'bg_color': '#003366',
-            'font_color': 'white'
-        })
-        
-        header_format = workbook.add_format({
-            'bold': True,
-            'font_size': 12,
-            'align': 'center',
-            'valign': 'vcenter',
-            'bg_color': '#4472C4',
-            'font_color': 'white',
-            'border': 1
-        })
-        
-        # Create sheet
-        sheet = workbook.add_worksheet('Payment Document')
-        
-        # Headers
-        headers = [
-            '#',
-            'Vendedor',
-            'Comisiones',
-            'USD Original',
-            'USD a Pagar',
-            'VES Original', 
-            'VES a Pagar'
-        ]
-        
-        # Write headers
-        row = 0
-        for col, header in enumerate(headers):
-            sheet.write(row, col, header, header_format)
-        
-        # Write data
-        row = 1
-        for idx, line in enumerate(self.document_id.line_ids, 1):
-            sheet.write(row, 0, idx)
-            sheet.write(row, 1, line.salesperson_id.name)
-            sheet.write(row, 2, line.commission_count)
-            sheet.write(row, 3, line.amount_usd_original)
-            sheet.write(row, 4, line.amount_usd_payment)
-            sheet.write(row, 5, line.amount_ves_original)
-            sheet.write(row, 6, line.amount_ves_payment)
-            row += 1
-        
-        workbook.close()
-        output.seek(0)
-        
-        # Save file
-        self.file_data = base64.b64encode(output.getvalue())
-        self.file_name = f"Documento_Pago_{self.document_id.name}.xlsx"
-
     def _generate_csv(self):
         """Generate CSV file"""
         output = io.StringIO()
@@ -151,4 +109,4 @@ class CommissionPaymentExportWizard(models.TransientModel):
         
         # Save file
         self.file_data = base64.b64encode(output.getvalue().encode())
-        self.file_name = f"Documento_Pago_{self.document_id.name}.csv"
\ No newline at end of file
+        self.file_name = f"Documento_Pago_{self.document_id.name}.csv"
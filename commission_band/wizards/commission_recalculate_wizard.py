@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, _
+from odoo.exceptions import ValidationError
+
+
+class CommissionRecalculateWizard(models.TransientModel):
+    _name = 'commission.recalculate.wizard'
+    _description = 'Recalculate Commissions Wizard'
+
+    date_from = fields.Date(
+        string='Date From',
+        required=True,
+        default=lambda self: fields.Date.today().replace(day=1)
+    )
+    date_to = fields.Date(
+        string='Date To',
+        required=True,
+        default=fields.Date.today
+    )
+    salesperson_ids = fields.Many2many(
+        'res.users',
+        string='Salespersons',
+        help="Leave empty to recalculate the commissions of all salespersons"
+    )
+    workers = fields.Integer(
+        string='Parallel Workers',
+        default=lambda self: int(
+            self.env['ir.config_parameter'].sudo().get_param('commission_band.recalculation_workers', 4)
+        ),
+        help="Number of salesperson partitions recalculated at the same time"
+    )
+
+    @api.constrains('date_from', 'date_to', 'workers')
+    def _check_values(self):
+        for wizard in self:
+            if wizard.date_from > wizard.date_to:
+                raise ValidationError(_("Date From must be before Date To."))
+            if wizard.workers < 1:
+                raise ValidationError(_("At least one worker is required."))
+
+    def action_recalculate(self):
+        """Queue the recalculation of the period as a background job"""
+        self.ensure_one()
+        
+        self.env['commission.job']._enqueue({
+            'name': _("Recalculate commissions from %(date_from)s to %(date_to)s",
+                      date_from=self.date_from, date_to=self.date_to),
+            'job_type': 'period_recalculate',
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+            'salesperson_ids': [(6, 0, self.salesperson_ids.ids)],
+            'recalculate_company_ids': [(6, 0, self.env.companies.ids)],
+            'workers': self.workers,
+        })
+        
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Commission Recalculation Queued'),
+                'message': _('Commissions of the period are being recalculated in the background.'),
+                'type': 'success',
+                'sticky': False,
+                'next': {'type': 'ir.actions.act_window_close'},
+            }
+        }